@@ -0,0 +1,136 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# --- Configuration ---
+# At most MAX_IN_FLIGHT model calls run at once across all sessions; the rest wait in FIFO order.
+MAX_IN_FLIGHT = int(os.environ.get("ELF_MAX_IN_FLIGHT", "8"))
+# Starting guess for how long one call takes, refined as calls complete
+INITIAL_SERVICE_SECONDS = float(os.environ.get("ELF_EXPECTED_CALL_SECONDS", "10"))
+
+metrics.describe("sleigh_gemini_in_flight", "Verdict calls running against the model.")
+metrics.describe("sleigh_gemini_queue_depth", "Verdict calls waiting for an admission slot.")
+
+
+class Ticket:
+    """A caller's place in the queue and, once started, its running call."""
+
+    def __init__(self, controller):
+        self._controller = controller
+        self.future = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self._finished = threading.Event()
+
+    def done(self):
+        return self.future.done()
+
+    def wait(self, timeout=None):
+        """Blocks until the call finishes (or timeout). Returns True if it finished."""
+        return self._finished.wait(timeout)
+
+    def result(self, timeout=None):
+        return self.future.result(timeout=timeout)
+
+    def position(self):
+        """1-based position in the wait queue, or 0 once the call is running."""
+        return self._controller.position(self)
+
+    def estimated_wait(self):
+        """Estimated seconds until the call starts."""
+        return self._controller.estimated_wait(self)
+
+    def cancel(self):
+        """Drops the ticket if it has not started yet. Returns True if it was dropped."""
+        return self._controller.cancel(self)
+
+
+class AdmissionController:
+    """
+    Bounded worker pool for model calls with a FIFO wait queue, so a traffic
+    spike turns into queueing instead of quota errors.
+    """
+
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, initial_service=INITIAL_SERVICE_SECONDS):
+        self.max_in_flight = max(1, max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="elf-gpt")
+        self._lock = threading.Lock()
+        self._waiting = deque()
+        self.in_flight = 0
+        self.avg_service = initial_service
+
+    def submit(self, fn, *args, **kwargs):
+        ticket = Ticket(self)
+        with self._lock:
+            self._waiting.append(ticket)
+            # ThreadPoolExecutor starts work in submission order, matching _waiting
+            ticket.future = self._executor.submit(self._run, ticket, fn, args, kwargs)
+        # Completion callback wakes waiters the instant the result is ready
+        ticket.future.add_done_callback(lambda f: ticket._finished.set())
+        return ticket
+
+    def _run(self, ticket, fn, args, kwargs):
+        with self._lock:
+            self._remove_waiting(ticket)
+            ticket.started_at = time.time()
+            self.in_flight += 1
+        metrics.observe("sleigh_stage_seconds", ticket.started_at - ticket.submitted_at, {"stage": "queue_wait"})
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.time() - ticket.started_at
+            with self._lock:
+                self.in_flight -= 1
+                # Exponentially weighted average keeps the estimate current
+                self.avg_service = 0.8 * self.avg_service + 0.2 * elapsed
+
+    def _remove_waiting(self, ticket):
+        try:
+            self._waiting.remove(ticket)
+        except ValueError:
+            pass
+
+    def position(self, ticket):
+        with self._lock:
+            try:
+                return self._waiting.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def estimated_wait(self, ticket):
+        position = self.position(ticket)
+        if position == 0:
+            return 0.0
+        # Every max_in_flight callers ahead of us is roughly one call duration
+        return math.ceil(position / self.max_in_flight) * self.avg_service
+
+    def cancel(self, ticket):
+        with self._lock:
+            cancelled = ticket.future.cancel()
+            if cancelled:
+                self._remove_waiting(ticket)
+            return cancelled
+
+    def queue_depth(self):
+        with self._lock:
+            return len(self._waiting)
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    """Returns the process-wide admission controller."""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+            metrics.gauge("sleigh_gemini_in_flight", lambda: _controller.in_flight)
+            metrics.gauge("sleigh_gemini_queue_depth", _controller.queue_depth)
+        return _controller
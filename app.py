@@ -1,25 +1,42 @@
+import time
+# Start of this script run, for the script_run stage timing at the bottom
+script_started = time.perf_counter()
+
 import streamlit as st
-import google.generativeai as genai
 from PIL import Image, ImageOps
-import time
 import random
-import json
-import base64
+import hashlib
 import os
-import threading
+import uuid
 import streamlit.components.v1 as components
-import importlib
-
-# Import the new PDF generator AND FORCE RELOAD to fix cache issues
-import pdf_generator
-importlib.reload(pdf_generator)
-
-# Try to import stripe for secure verification
-try:
-    import stripe
-    stripe_available = True
-except ImportError:
-    stripe_available = False
+import importlib.util
+
+# Dev mode: re-execute pdf_generator on every rerun so layout edits show up
+# without a restart. Off by default; otherwise pdf_generator (with ReportLab
+# and pypdf) is only imported by render_cache on the first PDF render.
+if os.environ.get("SLEIGH_DEV_RELOAD", "0") == "1":
+    import pdf_generator
+    importlib.reload(pdf_generator)
+import render_cache
+import elf_gpt
+import admission
+import static_assets
+import metrics
+import session_images
+import payments
+import result_store
+import prefetch
+import warmup
+
+# Stripe is used for secure verification if installed; the SDK itself is
+# imported on the first payment lookup (see stripe_retrieve)
+stripe_available = importlib.util.find_spec("stripe") is not None
+
+# Scrape endpoint / JSON log for per-stage timings (started once per process)
+metrics.start_exporters()
+metrics.describe("sleigh_results_restored_total", "Results screens restored from the result store after a payment redirect.")
+# Stripe webhook receiver feeding the payment ledger (started once per process)
+payments.start_webhook_server()
 
 # --- APP CONFIGURATION ---
 st.set_page_config(
@@ -30,442 +47,28 @@ st.set_page_config(
 )
 # ... your imports ...
 
-hide_streamlit_style = """
-            <style>
-            #MainMenu {visibility: hidden;}
-            footer {visibility: hidden;}
-            header {visibility: hidden;}
-            </style>
-            """
-st.markdown(hide_streamlit_style, unsafe_allow_html=True)
-
 # --- CUSTOM CSS (The "App" Look) ---
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Mountains+of+Christmas:wght@700&family=Roboto:wght@400;700&display=swap');
-
-    /* General Background & Scrollbar Fix */
-    html, body, [data-testid="stAppViewContainer"] {
-        overflow-x: hidden !important;
-        width: 100%;
-        margin: 0;
-        padding: 0;
-    }
-    
-    .stApp {
-        background-color: #ffffff;
-        max-width: 500px;
-        margin: 0 auto;
-        overflow-x: hidden !important; /* Force hidden overflow */
-        text-align: center;
-    }
-
-    /* Remove default top padding */
-    .block-container {
-        padding-top: 0 !important;
-        padding-bottom: 0 !important;
-        overflow-x: hidden !important; /* Ensure content container doesn't scroll */
-    }
-    
-    /* Center all text elements */
-    .stApp p, .stApp h1, .stApp h2, .stApp h3, .stApp label, .stApp div {
-        text-align: center;
-    }
-
-    /* 1. Custom Red Header Bar - Fixed for mobile */
-    .header-container {
-        background-color: #C93A3C;
-        padding: 25px 0; 
-        margin-top: -30px; 
-        
-        /* Breakout Logic */
-        position: relative;
-        left: 50%;
-        right: 50%;
-        margin-left: -50vw;
-        margin-right: -50vw;
-        width: 100vw;
-        max-width: 100vw;
-        
-        text-align: center;
-        box-shadow: 0 4px 10px rgba(0,0,0,0.15);
-        margin-bottom: 20px;
-        box-sizing: border-box;
-        overflow: hidden;
-    }
-    
-    .header-logo-wrapper {
-        display: flex;
-        align-items: center;
-        justify-content: space-between; 
-        gap: 10px;
-        padding: 0 15%; /* Increased padding significantly to move images inwards */
-        width: 100%;
-        max-width: 700px; /* Constrain width on desktop */
-        margin: 0 auto;
-        box-sizing: border-box;
-    }
-    
-    .logo-text {
-        font-family: 'Mountains of Christmas', cursive;
-        color: white;
-        font-size: clamp(2rem, 8vw, 3rem);
-        line-height: 1;
-        text-shadow: 2px 2px 4px rgba(0,0,0,0.3);
-        margin: 0;
-    }
-
-    .header-logo-img {
-        max-height: 60px; /* Reduced height */
-        width: auto;
-        max-width: 50%; /* Reduced max-width */
-        filter: drop-shadow(2px 2px 4px rgba(0,0,0,0.3));
-        object-fit: contain;
-    }
-    
-    .header-elf-img {
-        max-height: 60px; /* Reduced height */
-        width: auto;
-        max-width: 30%; /* Reduced max-width */
-        filter: drop-shadow(2px 2px 4px rgba(0,0,0,0.3));
-        object-fit: contain;
-        /* Removed rotation */
-    }
-    
-    .powered-by {
-        color: white;
-        font-family: 'Roboto', sans-serif;
-        font-size: clamp(0.65rem, 2vw, 0.75rem);
-        font-weight: 600;
-        text-transform: uppercase;
-        opacity: 0.95;
-        margin-top: 8px;
-        letter-spacing: 0.5px;
-    }
-
-    /* 2. Text Styling */
-    .intro-text {
-        text-align: center;
-        font-family: 'Roboto', sans-serif;
-        color: #333;
-        font-size: clamp(0.9rem, 3vw, 1.05rem);
-        margin-bottom: 25px;
-        padding: 0 15px;
-        line-height: 1.5;
-    }
-
-    .small-text {
-        font-size: clamp(0.75rem, 2.5vw, 0.85rem);
-        color: #666;
-        text-align: center;
-        margin: 20px 15px;
-        line-height: 1.6;
-        font-family: 'Courier New', monospace;
-    }
-
-    /* 3. Aggressive Button Styling using Data Test IDs */
-    [data-testid="stButton"] button, 
-    [data-testid="stLinkButton"] a, 
-    [data-testid="stDownloadButton"] button {
-        width: 100%;
-        background: linear-gradient(180deg, #5FBA47 0%, #4BA639 100%) !important;
-        color: white !important;
-        border: none !important;
-        border-radius: 50px !important;
-        padding: 18px 25px !important;
-        font-family: 'Helvetica', 'Arial', sans-serif !important;
-        font-weight: bold !important;
-        font-size: clamp(1.2rem, 4vw, 1.5rem) !important;
-        box-shadow: 0px 6px 0px #357A2B, 0px 8px 15px rgba(0,0,0,0.2) !important;
-        transition: all 0.15s !important;
-        display: flex !important;
-        justify-content: center !important;
-        align-items: center !important;
-        text-decoration: none !important;
-        text-transform: none !important;
-    }
-
-    /* Force ALL children elements (p tags, spans) to inherit the white color */
-    [data-testid="stButton"] button *, 
-    [data-testid="stLinkButton"] a *, 
-    [data-testid="stDownloadButton"] button * {
-        color: white !important;
-        font-family: 'Helvetica', 'Arial', sans-serif !important;
-        font-weight: bold !important;
-        fill: white !important; /* For icons if any */
-    }
-
-    /* Hover States */
-    [data-testid="stButton"] button:hover, 
-    [data-testid="stLinkButton"] a:hover, 
-    [data-testid="stDownloadButton"] button:hover {
-        background: linear-gradient(180deg, #6FCA57 0%, #5BA749 100%) !important;
-        transform: translateY(-2px);
-        box-shadow: 0px 8px 0px #357A2B, 0px 10px 20px rgba(0,0,0,0.25) !important;
-        color: white !important;
-    }
-
-    /* Active States */
-    [data-testid="stButton"] button:active, 
-    [data-testid="stLinkButton"] a:active, 
-    [data-testid="stDownloadButton"] button:active {
-        transform: translateY(3px);
-        box-shadow: 0px 3px 0px #357A2B, 0px 4px 8px rgba(0,0,0,0.2) !important;
-        color: white !important;
-        border: none !important;
-    }
-
-    /* Secondary Button Override (Grey) */
-    .secondary-btn [data-testid="stButton"] button {
-        background: linear-gradient(180deg, #B0B0B0 0%, #909090 100%) !important;
-        box-shadow: 0px 5px 0px #606060, 0px 6px 12px rgba(0,0,0,0.2) !important;
-    }
-    
-    .secondary-btn [data-testid="stButton"] button:hover {
-        background: linear-gradient(180deg, #C0C0C0 0%, #A0A0A0 100%) !important;
-    }
-
-    /* Camera/Upload buttons in two-column layout */
-    .camera-upload-row {
-        display: flex;
-        gap: 10px;
-        margin-bottom: 20px;
-    }
-    
-    .camera-upload-row > div {
-        flex: 1;
-    }
-    
-    /* Improve caption visibility */
-    .stApp p, .stApp caption, .stApp small {
-        color: #555 !important;
-        text-align: center;
-    }
-    
-    /* Success messages */
-    .stSuccess {
-        background-color: #d4edda !important;
-        color: #155724 !important;
-        border: 1px solid #c3e6cb !important;
-        border-radius: 10px !important;
-        padding: 12px !important;
-        font-weight: 600 !important;
-    }
-    
-    /* Warning messages */
-    .stWarning {
-        background-color: #fff3cd !important;
-        color: #856404 !important;
-        border: 1px solid #ffeaa7 !important;
-        border-radius: 10px !important;
-        padding: 12px !important;
-        font-weight: 600 !important;
-    }
-    
-    /* Info messages */
-    .stInfo {
-        background-color: #d1ecf1 !important;
-        color: #0c5460 !important;
-        border: 1px solid #bee5eb !important;
-        border-radius: 10px !important;
-        padding: 12px !important;
-    }
-
-    /* 4. Gold Frame Video */
-    .gold-frame {
-        border: 8px solid #D4AF37;
-        border-radius: 15px;
-        background: linear-gradient(135deg, #1a1a1a 0%, #000000 100%);
-        padding: 0;
-        margin: 5px 15px 30px 15px; /* Reduced top margin to remove gap */
-        box-shadow: 
-            0 8px 20px rgba(0,0,0,0.4),
-            inset 0 0 30px rgba(0,0,0,0.6),
-            0 0 0 2px #B8941E,
-            0 0 0 10px #D4AF37;
-        position: relative;
-        overflow: hidden;
-        max-width: 100%;
-        box-sizing: border-box;
-    }
-    
-    .gold-frame img {
-        width: 100%;
-        display: block;
-        border-radius: 5px;
-    }
-
-    /* 5. Result Typography */
-    .verdict-title {
-        font-family: 'Mountains of Christmas', cursive;
-        font-size: clamp(2rem, 6vw, 2.5rem);
-        text-align: center;
-        line-height: 1.2;
-        margin: 20px 0 15px 0;
-        padding: 0 15px;
-    }
-    
-    .elf-feedback-section {
-        background: #f8f8f8;
-        border-radius: 15px;
-        padding: 20px 15px;
-        margin: 20px 15px;
-    }
-    
-    .elf-image-container {
-        text-align: center;
-        margin-bottom: 15px;
-    }
-    
-    .elf-image-container img {
-        width: 150px;
-        height: auto;
-        max-width: 100%;
-    }
-    
-    .feedback-text {
-        font-family: 'Roboto', sans-serif;
-        font-size: clamp(0.85rem, 2.5vw, 0.95rem);
-        line-height: 1.6;
-        color: #222 !important;
-        text-align: center;
-    }
-    
-    .score-display {
-        font-family: 'Mountains of Christmas', cursive;
-        font-size: clamp(1.5rem, 5vw, 2rem);
-        text-align: center;
-        margin: 15px 0;
-        font-weight: bold;
-    }
-    
-    .santa-comment-box {
-        margin: 20px 15px;
-        padding: 20px 15px;
-        background: linear-gradient(135deg, #f5f5f5 0%, #e8e8e8 100%);
-        border-radius: 15px;
-        border: 2px solid #ddd;
-    }
-    
-    .santa-comment-box strong {
-        font-family: 'Mountains of Christmas', cursive;
-        font-size: clamp(1.1rem, 4vw, 1.3rem);
-        color: #C93A3C !important;
-    }
-    
-    .santa-comment-box em {
-        font-family: 'Roboto', sans-serif;
-        color: #333 !important;
-        font-size: clamp(0.85rem, 2.5vw, 0.95rem);
-        line-height: 1.5;
-        font-style: normal;
-        display: block;
-        margin-top: 8px;
-    }
-
-    /* File uploader styling */
-    .stFileUploader {
-        padding: 0 !important;
-        margin: 0 !important;
-    }
-    
-    .stFileUploader > div {
-        padding: 0 !important;
-    }
-
-    /* Hide the file size text (e.g. "1.2MB") in the file uploader list */
-    [data-testid="stFileUploader"] small {
-        display: none !important;
-    }
-
-    /* Center and style the file uploader label to match app text */
-    .stFileUploader label {
-        width: 100%;
-        text-align: center !important;
-        justify-content: center;
-        font-family: 'Roboto', sans-serif !important;
-        color: #333 !important;
-        font-size: clamp(0.9rem, 3vw, 1.05rem) !important;
-        margin-bottom: 5px;
-    }
-    
-    /* Text input styling for Name field */
-    .stTextInput label {
-        font-family: 'Roboto', sans-serif !important;
-        color: #333 !important;
-        text-align: center !important;
-        width: 100%;
-    }
-    
-    /* Candy Cane Progress Bar */
-    .progress-container {
-      width: 100%;
-      height: 30px;
-      border-radius: 15px;
-      border: 2px solid #C93A3C;
-      overflow: hidden;
-      background: #fff;
-      box-sizing: border-box;
-      margin: 10px 0;
-      box-shadow: inset 0 2px 5px rgba(0,0,0,0.1);
-    }
-
-    .progress-bar {
-      height: 100%;
-      width: 100%;
-      background: repeating-linear-gradient(
-        45deg,
-        #C93A3C 0px,
-        #C93A3C 20px,
-        #ffffff 20px,
-        #ffffff 40px
-      );
-      /* Mathematically calculated for 40px diagonal pattern: 40 * sqrt(2) ≈ 56.57px */
-      background-size: 56.57px 56.57px;
-      animation: moveStripes 1s linear infinite;
-    }
-
-    @keyframes moveStripes {
-      0% { background-position: 0 0; }
-      100% { background-position: 56.57px 0; }
-    }
-
-    /* Hide Streamlit Branding */
-    #MainMenu {display: none;}
-    footer {display: none;}
-    header {display: none;}
-    
-    /* STRONG Disable Fullscreen on Images */
-    /* 1. Disable pointer events on the image container */
-    [data-testid="stImage"] {
-        pointer-events: none;
-    }
-    /* 2. Hide the fullscreen button by attribute */
-    button[title="View fullscreen"] {
-        display: none !important;
-        visibility: hidden !important;
-    }
-    /* 3. Hide any button inside the image container */
-    [data-testid="stImage"] button {
-        display: none !important;
-    }
-    /* 4. Force hide StyledFullScreenButton */
-    [data-testid="StyledFullScreenButton"] {
-        display: none !important;
-    }
-    
-</style>
-""", unsafe_allow_html=True)
+# assets/style.css, linked as a hashed static file so reruns don't resend it
+st.markdown(static_assets.stylesheet_html(), unsafe_allow_html=True)
 
 # --- SESSION STATE INITIALIZATION ---
 if 'result' not in st.session_state:
     st.session_state.result = None
-if 'images' not in st.session_state:
-    st.session_state.images = None
+if 'image_key' not in st.session_state:
+    # Submitted photos live in session_images under this key, compressed
+    st.session_state.image_key = None
+if 'result_token' not in st.session_state:
+    # Key of this verdict in result_store; rides through checkout as client_reference_id
+    st.session_state.result_token = None
 if 'rotation_angles' not in st.session_state:
     st.session_state.rotation_angles = {}
 if 'user_name' not in st.session_state:
     st.session_state.user_name = ""
+if 'decoded_uploads' not in st.session_state:
+    st.session_state.decoded_uploads = {}
+if 'prefetch' not in st.session_state:
+    # Speculative verdict for the photos in the uploader (prefetch.ENABLED only)
+    st.session_state.prefetch = None
 
 # --- API KEY SETUP ---
 try:
@@ -473,29 +76,38 @@ try:
 except:
     api_key = os.environ.get("GEMINI_API_KEY", "")
 
+# Templates, fonts, static images and the Gemini connection, once per process.
+# serve.py has already done this before the port opened; under a plain
+# `streamlit run` it happens in the background from the first page view.
+warmup.start(api_key, background=True)
+
 # --- STRIPE API SETUP ---
 stripe_api_key = None
 try:
     stripe_api_key = st.secrets["STRIPE_API_KEY"]
-    if stripe_available:
-        stripe.api_key = stripe_api_key
 except:
     # Use env var or default to None
     stripe_api_key = os.environ.get("STRIPE_API_KEY", None)
-    if stripe_available and stripe_api_key:
-        stripe.api_key = stripe_api_key
 
 # --- FUNCTIONS ---
+def stripe_retrieve():
+    """Stripe's checkout session lookup, or None without the SDK and an API key."""
+    if not (stripe_available and stripe_api_key):
+        return None
+    import stripe
+    stripe.api_key = stripe_api_key
+    return stripe.checkout.Session.retrieve
+
 def verify_payment(session_id):
     """
-    Verifies payment with Stripe API if available.
+    Verifies payment against the webhook ledger, then the Stripe API if available.
     Otherwise falls back to insecure check for testing.
     """
-    # 1. Secure Method (Requires 'stripe' pip install and API Key)
-    if stripe_available and stripe_api_key and session_id:
+    # 1. Secure Method: checkouts recorded by the Stripe webhook, plus a cached
+    # Stripe lookup for ones not delivered yet (Requires 'stripe' pip install and API Key)
+    if session_id:
         try:
-            session = stripe.checkout.Session.retrieve(session_id)
-            if session.payment_status == 'paid':
+            if payments.is_paid(session_id, retrieve=stripe_retrieve()):
                 return True
         except Exception as e:
             st.error(f"Payment verification failed: {e}")
@@ -514,11 +126,6 @@ def verify_payment(session_id):
         
     return False
 
-def get_base64_of_bin_file(bin_file):
-    with open(bin_file, 'rb') as f:
-        data = f.read()
-    return base64.b64encode(data).decode()
-
 def load_image_preserve_orientation(file):
     """Load image and fix orientation based on EXIF data"""
     img = Image.open(file)
@@ -526,78 +133,175 @@ def load_image_preserve_orientation(file):
     img = ImageOps.exif_transpose(img)
     return img
 
+def upload_key(file):
+    """Stable identity for an uploaded file: Streamlit's file id, else a content hash"""
+    file_id = getattr(file, "file_id", None)
+    if file_id:
+        return file_id
+    return hashlib.sha256(file.getvalue()).hexdigest()
+
+def get_decoded_upload(file):
+    """
+    Decodes an upload once per session and keeps the oriented image plus a
+    display thumbnail, so reruns (e.g. typing a name) don't re-decode photos.
+    """
+    cache = st.session_state.decoded_uploads
+    key = upload_key(file)
+    if key not in cache:
+        with metrics.timed("upload_decode"):
+            img = load_image_preserve_orientation(file)
+            img.load()
+            thumb = img.copy()
+            thumb.thumbnail((400, 400))
+        cache[key] = (img, thumb)
+    return cache[key]
+
+def submission_images(files):
+    """The decoded photos as they will be judged, with any rotation applied."""
+    pil_images = []
+    for idx, file in enumerate(files):
+        file_key = f"upload_{idx}"
+        img, _ = get_decoded_upload(file)
+        # Apply rotation if any
+        if st.session_state.rotation_angles.get(file_key, 0) != 0:
+            img = rotate_image(img, st.session_state.rotation_angles[file_key])
+        pil_images.append(img)
+    return pil_images
+
+def submission_signature(files):
+    """Identifies exactly what Submit would send: which uploads, in order, and their rotations."""
+    return tuple((upload_key(f), st.session_state.rotation_angles.get(f"upload_{idx}", 0))
+                 for idx, f in enumerate(files))
+
+def update_prefetch(files):
+    """
+    Keeps at most one speculative verdict per session, for exactly the photos
+    now in the uploader. A different set of photos cancels the old call.
+    """
+    pending = st.session_state.prefetch
+    signature = submission_signature(files)
+    if pending is not None and pending.usable(signature):
+        return
+    if pending is not None:
+        pending.cancel()
+        st.session_state.prefetch = None
+    if files and len(files) <= 2 and api_key:
+        st.session_state.prefetch = prefetch.Prefetch(signature, submission_images(files), api_key)
+
+def render_partial_verdict(placeholder, fields):
+    """Shows whatever verdict fields have streamed in so far, while the rest generate."""
+    score = fields.get("score")
+    color = "#333"
+    if isinstance(score, (int, float)):
+        color = "#C93A3C" if score >= 7 else "#5FBA47"
+
+    html = ""
+    if "verdict_title" in fields:
+        html += f'<div class="verdict-title" style="color: {color};">{fields["verdict_title"]}</div>'
+    if "roast_content" in fields or score is not None:
+        html += '<div class="elf-feedback-section">'
+        if "roast_content" in fields:
+            html += f'<div class="feedback-text">{fields["roast_content"]}</div>'
+        if score is not None:
+            html += f'<div class="score-display" style="color: {color};">Score: {score}/10</div>'
+        html += '</div>'
+    if "santa_comment" in fields:
+        html += f'<div class="santa-comment-box"><strong>Santa Says:</strong><br><br><em>{fields["santa_comment"]}</em></div>'
+    placeholder.markdown(html, unsafe_allow_html=True)
+
 def rotate_image(img, angle):
     """Rotate image by specified angle"""
     return img.rotate(angle, expand=True)
 
-def get_elf_verdict(images):
-    """Sends images to Gemini and returns JSON verdict."""
-    if not api_key:
-        # DO NOT use st.error here, it runs in a thread!
-        print("Missing API Key")
+def save_result(result, user_name, image_key):
+    """Persists the verdict and its stored photos; returns the result token, or None."""
+    store = result_store.get_result_store()
+    if store is None:
         return None
+    token = result_store.new_token()
+    images = [(img.data, img.thumb) for img in session_images.get_store().get(image_key)]
+    try:
+        with metrics.timed("result_save"):
+            store.save(token, result, user_name, images)
+    except Exception as e:
+        print(f"Result store write failed: {e}")
+        return None
+    return token
 
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.5-flash-preview-09-2025')
+def load_result(token):
+    """The StoredResult for a token, or None if it is unknown, expired or unreadable."""
+    store = result_store.get_result_store()
+    if store is None or not token:
+        return None
+    try:
+        return store.load(token)
+    except Exception as e:
+        print(f"Result store read failed: {e}")
+        return None
 
-    prompt = """
-    You are ELF-GPT 1.0, a sarcastic, trendy, and slightly judgmental Christmas Elf who's extremely online and fluent in both Gen-Z and Millennial culture. 
-    Analyze these photo(s) for "Christmas Spirit". 
-    
-    Your Output must be valid JSON with the following keys:
-    - "verdict_title": A short punchy title (e.g., "It's a Total SLEIGH!" or "Bah Humbug... So NAY.")
-    - "score": A number between 1 and 10.
-    - "roast_content": A paragraph of feedback mixing Gen-Z and Millennial slang. 
-      * If the score is high (7-10): Give high praise using terms like "slay", "no cap", "bussin", "it's giving Christmas vibes", "main character energy", "living your best life", "goals AF", "chef's kiss", "periodt", "understood the assignment"
-      * If the score is low (1-6): Roast them playfully using terms like "mid", "L", "not it", "big yikes", "cringe", "giving Grinch energy", "that's a no from me dawg", "oof", "this ain't it chief", "low-key embarrassing", "the bare minimum", "Netflix and no chill vibes"
-      Be funny, specific to the image details, and mix both generational slang naturally. Don't force it - let it flow conversationally.
-    - "santa_comment": A one-liner from Santa using either wholesome millennial phrases ("You're doing amazing, sweetie") or Gen-Z humor ("Bestie... we need to talk")
+def restore_result(session_id):
+    """
+    Back from checkout in a fresh session: finds the result token the payment
+    link carried and puts that verdict, name and photos back in session state.
     """
-
     try:
-        inputs = [prompt]
-        for img in images:
-            inputs.append(img)
-
-        response = model.generate_content(inputs)
-        text = response.text.replace('```json', '').replace('```', '')
-        return json.loads(text)
+        token = payments.client_reference(session_id, retrieve=stripe_retrieve())
     except Exception as e:
-        print(f"Elf-GPT crashed: {e}") 
-        return None
+        print(f"Checkout lookup failed for {session_id}: {e}")
+        return False
+    saved = load_result(token)
+    if saved is None:
+        return False
+    image_key = uuid.uuid4().hex
+    session_images.get_store().put_stored(image_key, [session_images.StoredImage(d, t) for d, t in saved.images])
+    st.session_state.image_key = image_key
+    st.session_state.result_token = token
+    st.session_state.user_name = saved.name
+    st.session_state.result = saved.verdict
+    metrics.inc("sleigh_results_restored_total")
+    return True
+
+def session_photos(image_key, result_token):
+    """
+    The session's StoredImages. If the image store evicted them, they are
+    reloaded from the result store.
+    """
+    store = session_images.get_store()
+    images = store.get(image_key)
+    if not images and image_key:
+        saved = load_result(result_token)
+        if saved and saved.images:
+            store.put_stored(image_key, [session_images.StoredImage(d, t) for d, t in saved.images])
+            images = store.get(image_key)
+    return images
+
+def render_session_report(image_key, result_token=None, **kwargs):
+    """Case file for the session's stored photos, looked up when the button is clicked."""
+    return render_cache.render_roast_report(pil_images=session_photos(image_key, result_token), **kwargs)
+
+def lazy_pdf(render, **kwargs):
+    """
+    Returns a callable for st.download_button that renders the PDF only when clicked.
+    Runs outside the script thread, so everything it needs is captured up front.
+    """
+    def build():
+        stream = render(**kwargs)
+        if stream is None:
+            raise RuntimeError("PDF generation returned None")
+        return stream.getvalue()
+    return build
 
 # --- MAIN UI ---
 
-# 1. Custom Header Block
-logo_html = ""
-elf_html = ""
+# 1. Custom Header Block (markup and image URLs are built once per process)
+st.markdown(static_assets.header_html(), unsafe_allow_html=True)
 
-try:
-    # Try to load the logo.png file
-    if os.path.exists("assets/logo.png"):
-        logo_base64 = get_base64_of_bin_file("assets/logo.png")
-        logo_html = f'<img src="data:image/png;base64,{logo_base64}" class="header-logo-img" alt="Sleigh or Nay?">'
-    else:
-        # Fallback to text if file missing
-        logo_html = '<div class="logo-text">Sleigh or Nay?</div>'
-        
-    # Try to load the elf_gpt.png file
-    if os.path.exists("assets/elf_gpt.png"):
-        elf_base64 = get_base64_of_bin_file("assets/elf_gpt.png")
-        elf_html = f'<img src="data:image/png;base64,{elf_base64}" class="header-elf-img" alt="Elf GPT">'
-        
-except Exception as e:
-    logo_html = '<div class="logo-text">Sleigh or Nay?</div>'
-
-st.markdown(f"""
-<div class="header-container">
-    <div class="header-logo-wrapper">
-        {logo_html}
-        {elf_html}
-    </div>
-</div>
-""", unsafe_allow_html=True)
 
+# Returning from the payment link lands in a new session: pick the verdict back
+# up from the result store instead of sending the user home to start again
+# (retried on each rerun until the webhook or Stripe lookup has the token)
+if st.session_state.result is None and st.query_params.get("session_id"):
+    restore_result(st.query_params.get("session_id"))
 
 # 2. Logic Controller
 if st.session_state.result is None:
@@ -620,6 +324,16 @@ if st.session_state.result is None:
     if uploaded_files:
         all_files.extend(uploaded_files)
 
+    # Forget decoded images for files that were removed from the uploader
+    current_keys = {upload_key(f) for f in all_files}
+    for key in list(st.session_state.decoded_uploads):
+        if key not in current_keys:
+            del st.session_state.decoded_uploads[key]
+
+    # Opt-in: get the verdict going while the user types a name
+    if prefetch.ENABLED:
+        update_prefetch(all_files)
+
     if all_files:
         # Show thumbnails with rotation controls
         st.markdown("### Your Photos:")
@@ -632,8 +346,8 @@ if st.session_state.result is None:
             if file_key not in st.session_state.rotation_angles:
                 st.session_state.rotation_angles[file_key] = 0
             
-            # Load and display image
-            img = load_image_preserve_orientation(file)
+            # Display the cached thumbnail (decoded once per upload)
+            _, img = get_decoded_upload(file)
             
             # Apply rotation if any
             if st.session_state.rotation_angles[file_key] != 0:
@@ -660,20 +374,7 @@ if st.session_state.result is None:
                 st.warning("Limit 2 photos! The elves can only process so much...")
             else:
                 # Load images with applied rotations
-                pil_images = []
-                for idx, file in enumerate(all_files):
-                    # Check if this is the camera photo
-                    file_key = f"upload_{idx}"
-                    
-                    img = load_image_preserve_orientation(file)
-                    
-                    # Apply rotation if any
-                    if file_key in st.session_state.rotation_angles and st.session_state.rotation_angles[file_key] != 0:
-                        img = rotate_image(img, st.session_state.rotation_angles[file_key])
-                    
-                    pil_images.append(img)
-                
-                st.session_state.images = pil_images
+                pil_images = submission_images(all_files)
                 
                 # --- THREADED API CALL WITH ANIMATED TEXT ---
                 
@@ -693,49 +394,88 @@ if st.session_state.result is None:
                     "Scanning the Naughty & Nice database..."
                 ]
                 
-                # Container to store result from thread
-                result_container = {"data": None}
+                # Streamed verdict fields land here from the worker thread
+                partial_fields = {}
+                on_field = partial_fields.__setitem__ if elf_gpt.STREAMING else None
+                preview_placeholder = st.empty()
                 
-                def run_api_call():
-                    result_container['data'] = get_elf_verdict(pil_images)
-
-                # Start API thread
-                api_thread = threading.Thread(target=run_api_call)
-                api_thread.start()
+                pending = st.session_state.prefetch
+                st.session_state.prefetch = None
+                if pending is not None and pending.usable(submission_signature(all_files)):
+                    # Already asked while the name was typed: pick up where it is
+                    ticket = pending.attach()
+                    partial_fields = pending.fields
+                else:
+                    if pending is not None:
+                        pending.cancel()
+                    # Queue the call on the shared, bounded worker pool
+                    ticket = admission.get_controller().submit(
+                        elf_gpt.get_elf_verdict, pil_images, api_key, on_field=on_field
+                    )
 
                 # Animation loop while waiting
-                start_time = time.time()
                 msg_index = 0
-                while api_thread.is_alive():
-                    # Pick a message (cycle or random)
-                    current_text = loading_texts[msg_index % len(loading_texts)]
-                    
-                    progress_placeholder.markdown(f"""
-                        <div class="progress-container">
-                          <div class="progress-bar"></div>
-                        </div>
-                        <p style="text-align: center; font-style: italic; color: #666; margin-top: 10px;">
-                            {current_text}
-                        </p>
-                    """, unsafe_allow_html=True)
-                    
-                    # Wait a bit before next update
-                    time.sleep(2)
-                    msg_index = random.randint(0, len(loading_texts) - 1)
-                    
-                    # Timeout after 60 seconds
-                    if time.time() - start_time > 60:
-                        break
-
-                # Thread finished
-                api_thread.join(timeout=1) # Ensure thread is done
-                result = result_container['data']
+                next_message_at = 0
+                shown_fields = 0
+                try:
+                    while not ticket.done():
+                        if time.time() >= next_message_at:
+                            # Pick a message (cycle or random)
+                            current_text = loading_texts[msg_index % len(loading_texts)]
+                            
+                            # While queued, tell the user where they are in line
+                            position = ticket.position()
+                            if position > 0:
+                                wait_s = int(ticket.estimated_wait())
+                                current_text = f"The elves are busy! You're #{position} in line (about {wait_s}s)..."
+                            
+                            progress_placeholder.markdown(f"""
+                                <div class="progress-container">
+                                  <div class="progress-bar"></div>
+                                </div>
+                                <p style="text-align: center; font-style: italic; color: #666; margin-top: 10px;">
+                                    {current_text}
+                                </p>
+                            """, unsafe_allow_html=True)
+                            msg_index = random.randint(0, len(loading_texts) - 1)
+                            next_message_at = time.time() + 2
+                        
+                        # Fill in the verdict as its fields stream in
+                        if len(partial_fields) != shown_fields:
+                            shown_fields = len(partial_fields)
+                            render_partial_verdict(preview_placeholder, dict(partial_fields))
+                        
+                        # Wake up the moment the verdict lands; poll faster while streaming
+                        if ticket.wait(timeout=0.25 if on_field else 2):
+                            break
+                        
+                        # Backstop only: the call itself is cancelled at elf_gpt.REQUEST_TIMEOUT
+                        if ticket.started_at and time.time() - ticket.started_at > elf_gpt.REQUEST_TIMEOUT + 5:
+                            break
+                finally:
+                    # Rerun or timeout before the call started: give the slot back
+                    if not ticket.done():
+                        ticket.cancel()
+
+                result = None
+                if ticket.done() and not ticket.future.cancelled():
+                    result = ticket.result()
                 
                 # Clear progress bar
                 progress_placeholder.empty()
+                preview_placeholder.empty()
                 
                 if result:
                     st.session_state.result = result
+                    # Keep compressed copies for the results screen and case file
+                    # and let the decoded photos go. Cleared in place: Streamlit
+                    # holds on to a replaced value until the next interaction.
+                    image_key = st.session_state.image_key or uuid.uuid4().hex
+                    session_images.get_store().put(image_key, pil_images)
+                    st.session_state.image_key = image_key
+                    st.session_state.decoded_uploads.clear()
+                    # Survives the trip through Stripe checkout
+                    st.session_state.result_token = save_result(result, st.session_state.user_name, image_key)
                     # Clear rotations when submitting
                     st.session_state.rotation_angles = {}
                     st.rerun()
@@ -745,7 +485,7 @@ if st.session_state.result is None:
     # Video Frame with image
     # Removed gold-frame wrapper, just showing image
     try:
-        st.image("assets/santa_frame.png", use_container_width=True)
+        st.image(static_assets.asset_image("santa_frame.png"), use_container_width=True)
     except:
         st.markdown("""
             <div style="position: relative; padding-top: 56.25%;">
@@ -774,7 +514,7 @@ else:
         
         with col_text:
             try:
-                st.image("assets/sleigh_title.png", use_container_width=True)
+                st.image(static_assets.asset_image("sleigh_title.png"), use_container_width=True)
             except:
                 verdict_title = data.get("verdict_title", "IT'S A TOTAL SLEIGH!")
                 st.markdown(f"""
@@ -785,7 +525,7 @@ else:
         
         with col_elf:
             try:
-                st.image("assets/happy_elf.png", use_container_width=True)
+                st.image(static_assets.asset_image("happy_elf.png"), use_container_width=True)
             except:
                 st.markdown(f"""
                 <div style='font-size:6rem; text-align:center;'>Sleigh!</div>
@@ -797,7 +537,7 @@ else:
         
         with col_elf:
             try:
-                st.image("assets/grumpy_elf.png", use_container_width=True)
+                st.image(static_assets.asset_image("grumpy_elf.png"), use_container_width=True)
             except:
                 st.markdown(f"""
                 <div style='font-size:6rem; text-align:center;'>Nay.</div>
@@ -805,7 +545,7 @@ else:
         
         with col_text:
             try:
-                st.image("assets/nay_title.png", use_container_width=True)
+                st.image(static_assets.asset_image("nay_title.png"), use_container_width=True)
             except:
                 verdict_title = data.get("verdict_title", "BAH HUMBUG... SO NAY.")
                 st.markdown(f"""
@@ -815,14 +555,20 @@ else:
                 """, unsafe_allow_html=True)
 
     # --- DISPLAY SUBMITTED PHOTOS ---
-    if st.session_state.images:
+    # Stored 400px thumbnails go straight to the browser, no decoding here
+    submitted_images = session_photos(st.session_state.image_key, st.session_state.result_token)
+    if submitted_images:
         st.markdown("<div style='margin-top: 20px;'></div>", unsafe_allow_html=True)
         # Create columns based on number of images
-        cols = st.columns(len(st.session_state.images))
+        cols = st.columns(len(submitted_images))
         for idx, col in enumerate(cols):
             with col:
                 # Add a subtle border/shadow to make them pop against the white background
-                st.image(st.session_state.images[idx], use_container_width=True)
+                st.image(submitted_images[idx].thumbnail_bytes(), use_container_width=True)
+
+    # Stand-in verdict while Elf-GPT is unreachable
+    if data.get("provisional"):
+        st.info("Elf-GPT is on a cocoa break, so the backup elves made this provisional verdict. Start over later for the official one!")
 
     # 2. Feedback Section (all content below)
     # Combine content into one markdown block to prevent empty container artifact ("grey bar")
@@ -873,7 +619,9 @@ else:
         
         safe_name_test = name_on_cert_test.strip().replace(" ", "_")
 
-        test_pdf_bytes = pdf_generator.create_certificate_pdf(
+        # PDFs are built only when a button is clicked
+        test_pdf_bytes = lazy_pdf(
+            render_cache.render_certificate,
             name=name_on_cert_test,
             verdict=data.get('verdict_title', "Sleigh or Nay?"),
             score=score,
@@ -882,38 +630,36 @@ else:
         )
         
         # Generate the Case File
-        test_report_bytes = pdf_generator.create_roast_report(
+        test_report_bytes = lazy_pdf(
+            render_session_report,
+            image_key=st.session_state.image_key,
+            result_token=st.session_state.result_token,
             name=name_on_cert_test,
             verdict=data.get('verdict_title', "Sleigh or Nay?"),
             score=score,
             roast_content=data.get('roast_content', "No roast found."),
             santa_comment=data.get('santa_comment', "Ho Ho Ho!"),
-            pil_images=st.session_state.images,
             template_path=report_template_test,
             report_date=time.strftime('%B %d, %Y') 
         )
         
-        if test_pdf_bytes:
-            st.download_button(
-                label="Test: Download Filled Certificate PDF",
-                data=test_pdf_bytes,
-                file_name="Santa_Certificate_TEST.pdf",
-                mime="application/pdf",
-                use_container_width=True
-            )
-        else:
-            st.warning("Certificate generation returned None.")
+        st.download_button(
+            label="Test: Download Filled Certificate PDF",
+            data=test_pdf_bytes,
+            file_name="Santa_Certificate_TEST.pdf",
+            mime="application/pdf",
+            on_click="ignore",
+            use_container_width=True
+        )
         
-        if test_report_bytes:
-            st.download_button(
-                label="Test: Download Case File PDF",
-                data=test_report_bytes,
-                file_name=f"Official_Elf_Report_{safe_name_test}.pdf",
-                mime="application/pdf",
-                use_container_width=True
-            )
-        else:
-            st.warning("Case File generation returned None.")
+        st.download_button(
+            label="Test: Download Case File PDF",
+            data=test_report_bytes,
+            file_name=f"Official_Elf_Report_{safe_name_test}.pdf",
+            mime="application/pdf",
+            on_click="ignore",
+            use_container_width=True
+        )
     except Exception as e:
         st.error(f"Test Button Generation Failed: {e}")
     # -----------------------------------------------
@@ -933,8 +679,9 @@ else:
         
         safe_name = name_on_cert.strip().replace(" ", "_")
 
-        # Generate the PDF Certificate using the utility module
-        pdf_bytes = pdf_generator.create_certificate_pdf(
+        # Generate the PDF Certificate on click (cached, so it is only built once)
+        pdf_bytes = lazy_pdf(
+            render_cache.render_certificate,
             name=name_on_cert,
             verdict=data.get('verdict_title', "Sleigh or Nay?"),
             score=score,
@@ -943,48 +690,56 @@ else:
         )
         
         # Generate the Case File
-        report_bytes = pdf_generator.create_roast_report(
+        report_bytes = lazy_pdf(
+            render_session_report,
+            image_key=st.session_state.image_key,
+            result_token=st.session_state.result_token,
             name=name_on_cert,
             verdict=data.get('verdict_title', "Sleigh or Nay?"),
             score=score,
             roast_content=data.get('roast_content', "No roast found."),
             santa_comment=data.get('santa_comment', "Ho Ho Ho!"),
-            pil_images=st.session_state.images,
             template_path=report_template,
             report_date=time.strftime('%B %d, %Y')
         )
         
-        if pdf_bytes:
-            # Create dynamic filename
-            type_str = "nice" if is_sleigh else "naughty"
-            
-            st.download_button(
-                label="Download Certificate",
-                data=pdf_bytes,
-                file_name=f"certificate_{type_str}_{safe_name}.pdf",
-                mime="application/pdf",
-                use_container_width=True
-            )
+        # Create dynamic filename
+        type_str = "nice" if is_sleigh else "naughty"
+        
+        st.download_button(
+            label="Download Certificate",
+            data=pdf_bytes,
+            file_name=f"certificate_{type_str}_{safe_name}.pdf",
+            mime="application/pdf",
+            on_click="ignore",
+            use_container_width=True
+        )
             
-        if report_bytes:
-            st.download_button(
-                label="Download Full Case File",
-                data=report_bytes,
-                file_name=f"Official_Elf_Report_{safe_name}.pdf",
-                mime="application/pdf",
-                use_container_width=True
-            )
+        st.download_button(
+            label="Download Full Case File",
+            data=report_bytes,
+            file_name=f"Official_Elf_Report_{safe_name}.pdf",
+            mime="application/pdf",
+            on_click="ignore",
+            use_container_width=True
+        )
         
         if st.button("Start Over", key="restart_paid", use_container_width=True):
              st.session_state.result = None
-             st.session_state.images = None
+             session_images.get_store().discard(st.session_state.image_key)
+             st.session_state.image_key = None
+             st.session_state.result_token = None
              st.session_state.user_name = ""
              st.query_params.clear()
              st.rerun()
              
     else:
         # The Payment Link
-        st.link_button("Buy Official Certificate", "https://buy.stripe.com/test_00w00k29UepK8l23bN4ZG00", use_container_width=True)
+        payment_link = "https://buy.stripe.com/test_00w00k29UepK8l23bN4ZG00"
+        if st.session_state.result_token:
+            # Stripe puts it on the checkout session, so the paid redirect finds this result
+            payment_link += f"?client_reference_id={st.session_state.result_token}"
+        st.link_button("Buy Official Certificate", payment_link, use_container_width=True)
         
         if st.button("Post Your Roast", use_container_width=True):
             share_text = f"{verdict_title}\n\nScore: {score}/10\n\n{data.get('roast_content', '')[:100]}..."
@@ -993,7 +748,12 @@ else:
         
         if st.button("Start Over", key="restart_unpaid", use_container_width=True):
             st.session_state.result = None
-            st.session_state.images = None
+            session_images.get_store().discard(st.session_state.image_key)
+            st.session_state.image_key = None
+            st.session_state.result_token = None
             st.session_state.rotation_angles = {}
             st.session_state.show_camera = False
             st.rerun()
+
+# Fixed cost of a script run. Runs cut short by st.rerun() are not recorded.
+metrics.observe("sleigh_stage_seconds", time.perf_counter() - script_started, {"stage": "script_run"})
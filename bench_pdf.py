@@ -0,0 +1,260 @@
+"""
+Benchmarks for pdf_generator with regression checks against a committed baseline.
+
+Runs create_certificate_pdf and create_roast_report over a matrix of inputs
+(0/1/2 images, 1-48 MP sources, short and long roasts, every template in
+assets/) and records median wall time, peak RSS and output size per case.
+
+    python bench_pdf.py                    # compare against bench_pdf_baseline.json
+    python bench_pdf.py --update-baseline  # re-record the baseline
+    python bench_pdf.py --filter 48mp      # only cases whose id contains "48mp"
+
+Each case runs in a fresh process so peak RSS belongs to that case alone. It
+includes the interpreter and the synthetic input images, so compare it
+against the baseline rather than reading it as an absolute cost. Wall times
+depend on the machine: re-record the baseline when the reference machine
+changes. Exits 1 if any case regressed beyond the tolerances.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(ROOT_DIR, "assets")
+BASELINE_PATH = os.path.join(ROOT_DIR, "bench_pdf_baseline.json")
+
+# 4:3 sources from a small phone photo up to a 48 MP camera sensor
+MEGAPIXELS = {1: (1152, 864), 12: (4000, 3000), 48: (8000, 6000)}
+IMAGE_COUNTS = (0, 1, 2)
+NAMES = {
+    "short": "Sam",
+    "long": "Bartholomew Montgomery Fitzwilliam-Cholmondeley III",
+}
+ROASTS = {
+    "short": "Tinsel overload, but we respect the commitment. Sleigh.",
+    # Longer than the 14 lines the case file prints, to exercise the cut-off
+    "long": " ".join(["The garland is doing cardio, the star is on a side quest, and the lights"
+                      " are blinking in Morse code for help. No cap, it's giving chaos."] * 25),
+}
+REPORT_DATE = "December 24, 2025"
+
+
+def _templates(prefix):
+    return sorted(os.path.basename(p) for p in glob.glob(os.path.join(ASSETS_DIR, prefix + "*.pdf")))
+
+
+def build_cases():
+    """Returns the benchmark matrix as a list of case dicts, keyed by a stable id."""
+    cases = []
+    for template in _templates("certificate_"):
+        for name_kind in NAMES:
+            cases.append({
+                "id": f"certificate/{template[:-4]}/name-{name_kind}",
+                "kind": "certificate",
+                "template": template,
+                "name": name_kind,
+            })
+    for template in _templates("elf_report_"):
+        for count in IMAGE_COUNTS:
+            sizes = MEGAPIXELS if count else {0: None}
+            for mp in sizes:
+                for roast_kind in ROASTS:
+                    image_part = f"{count}img-{mp}mp" if count else "0img"
+                    cases.append({
+                        "id": f"report/{template[:-4]}/{image_part}/roast-{roast_kind}",
+                        "kind": "report",
+                        "template": template,
+                        "images": count,
+                        "mp": mp,
+                        "roast": roast_kind,
+                    })
+    return cases
+
+
+def _synthetic_image(size, seed):
+    """A smooth photo-like RGB image; deterministic so output sizes are comparable."""
+    from PIL import Image
+
+    base = Image.merge("RGB", (
+        Image.radial_gradient("L"),
+        Image.linear_gradient("L").rotate(90 * seed),
+        Image.radial_gradient("L").transpose(Image.Transpose.FLIP_LEFT_RIGHT),
+    ))
+    return base.resize(size, Image.Resampling.BILINEAR)
+
+
+def _peak_rss_mb():
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(case, repeat):
+    """
+    Worker entry point: renders one case once to warm the template cache, then
+    `repeat` more times. Returns (id, result dict, error or None).
+    """
+    try:
+        # Fixed document IDs and timestamps, so byte sizes only change with the code
+        from reportlab import rl_config
+        rl_config.invariant = 1
+
+        import pdf_generator
+
+        template_path = os.path.join(ASSETS_DIR, case["template"])
+        if case["kind"] == "certificate":
+            def render():
+                return pdf_generator.create_certificate_pdf(
+                    name=NAMES[case["name"]],
+                    verdict="Sleigh or Nay?",
+                    score=8,
+                    comment="Ho Ho Ho!",
+                    template_path=template_path
+                )
+        else:
+            images = [_synthetic_image(MEGAPIXELS[case["mp"]], i) for i in range(case["images"])]
+
+            def render():
+                return pdf_generator.create_roast_report(
+                    name="Benchmark Elf",
+                    verdict="IT'S A SLEIGH!",
+                    score=8,
+                    roast_content=ROASTS[case["roast"]],
+                    santa_comment="Ho Ho Ho! Bestie, you ate.",
+                    pil_images=images,
+                    template_path=template_path,
+                    report_date=REPORT_DATE
+                )
+
+        stream = render()
+        if stream is None:
+            raise RuntimeError("renderer returned None")
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stream = render()
+            times.append(time.perf_counter() - start)
+
+        return case["id"], {
+            "time_ms": round(statistics.median(times) * 1000, 2),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "bytes": len(stream.getvalue()),
+        }, None
+    except Exception as e:
+        return case["id"], None, str(e)
+
+
+def environment():
+    import PIL
+    import pypdf
+    import reportlab
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "pillow": PIL.__version__,
+        "reportlab": reportlab.Version,
+        "pypdf": pypdf.__version__,
+    }
+
+
+def compare(results, baseline, args):
+    """Returns a list of (case id, message) for every metric beyond its tolerance."""
+    regressions = []
+    for case_id, result in results.items():
+        base = baseline.get(case_id)
+        if not base:
+            continue
+        if (result["time_ms"] > base["time_ms"] * (1 + args.time_tolerance)
+                and result["time_ms"] - base["time_ms"] > args.time_floor_ms):
+            regressions.append((case_id, f"time {base['time_ms']:.1f} -> {result['time_ms']:.1f} ms"))
+        if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + args.rss_tolerance):
+            regressions.append((case_id, f"peak RSS {base['peak_rss_mb']:.1f} -> {result['peak_rss_mb']:.1f} MB"))
+        if result["bytes"] > base["bytes"] * (1 + args.size_tolerance):
+            regressions.append((case_id, f"size {base['bytes']} -> {result['bytes']} bytes"))
+    return regressions
+
+
+def _change(new, old):
+    if not old:
+        return "   new"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pdf_generator against a committed baseline.")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--filter", default=None, help="Only run cases whose id contains this text")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case; the median is kept")
+    parser.add_argument("--time-tolerance", type=float, default=0.30, help="Allowed fractional slowdown")
+    parser.add_argument("--time-floor-ms", type=float, default=5.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--rss-tolerance", type=float, default=0.15, help="Allowed fractional peak RSS growth")
+    parser.add_argument("--size-tolerance", type=float, default=0.02, help="Allowed fractional output growth")
+    args = parser.parse_args(argv)
+
+    cases = build_cases()
+    if args.filter:
+        cases = [c for c in cases if args.filter in c["id"]]
+    if not cases:
+        print("No benchmark cases selected")
+        return 1
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f).get("cases", {})
+    elif not args.update_baseline:
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one")
+
+    # One case per fresh process (maxtasksperchild=1), run one at a time so
+    # cases don't compete for CPU
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    failures = []
+    print(f"{'case':<58} {'time ms':>9} {'':>7} {'RSS MB':>7} {'':>7} {'bytes':>9} {'':>7}")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for case in cases:
+            case_id, result, error = pool.apply(run_case, (case, args.repeat))
+            if error:
+                failures.append((case_id, error))
+                print(f"{case_id:<58} FAILED: {error}")
+                continue
+            results[case_id] = result
+            base = baseline.get(case_id, {})
+            print(f"{case_id:<58} {result['time_ms']:>9.1f} {_change(result['time_ms'], base.get('time_ms')):>7} "
+                  f"{result['peak_rss_mb']:>7.1f} {_change(result['peak_rss_mb'], base.get('peak_rss_mb')):>7} "
+                  f"{result['bytes']:>9} {_change(result['bytes'], base.get('bytes')):>7}")
+
+    if args.update_baseline:
+        # Keep entries for cases that were filtered out of this run
+        merged = dict(baseline)
+        merged.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "repeat": args.repeat,
+                       "cases": dict(sorted(merged.items()))}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline} ({len(results)} cases updated)")
+        return 1 if failures else 0
+
+    regressions = compare(results, baseline, args)
+    for case_id, message in regressions:
+        print(f"REGRESSION {case_id}: {message}")
+    if failures:
+        print(f"{len(failures)} cases failed")
+    if not regressions and not failures:
+        print(f"{len(results)} cases within tolerance")
+    return 1 if regressions or failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Bulk certificate and case-file rendering.
+
+Reads verdict records from a JSONL or CSV file and renders their PDFs across a
+process pool. Example:
+
+    python bulk_render.py records.jsonl --out-dir out/ --merge class_4b.pdf
+
+Each record needs "score" and may carry "name", "verdict_title",
+"roast_content", "santa_comment", "images" (list, or ";"-separated in CSV)
+and "id". Records whose PDFs already exist in --out-dir are skipped, so an
+interrupted run can simply be restarted.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pdf_generator
+
+KINDS = ("certificate", "case_file")
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+
+class RecordTimeout(BaseException):
+    """
+    Raised by the alarm inside a render. A BaseException, so the
+    `except Exception` blocks in pdf_generator can't swallow it.
+    """
+
+
+def _on_alarm(signum, frame):
+    raise RecordTimeout()
+
+
+def load_records(path):
+    """Loads verdict records from a .jsonl or .csv file."""
+    records = []
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                images = row.get("images") or ""
+                row["images"] = [p.strip() for p in images.split(";") if p.strip()]
+                records.append(row)
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+
+    for idx, record in enumerate(records):
+        record_id = str(record.get("id") or f"{idx:05d}")
+        record["id"] = re.sub(r"[^A-Za-z0-9_.-]", "_", record_id)
+    return records
+
+
+def output_paths(record, out_dir, kinds):
+    return {kind: os.path.join(out_dir, f"{record['id']}_{kind}.pdf") for kind in kinds}
+
+
+def templates_for(score):
+    """Same template choice as the results screen in app.py."""
+    if score >= 7:
+        names = ("certificate_nice.pdf", "elf_report_sleigh.pdf")
+    else:
+        names = ("certificate_naughty.pdf", "elf_report_nay.pdf")
+    return tuple(os.path.join(ASSETS_DIR, n) for n in names)
+
+
+def _load_images(paths, base_dir):
+    from PIL import Image, ImageOps
+
+    images = []
+    for path in paths[:2]:
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+        img = Image.open(path)
+        images.append(ImageOps.exif_transpose(img))
+    return images
+
+
+def _write_atomic(path, stream):
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(stream.getvalue())
+    os.replace(tmp_path, path)
+
+
+def render_record(record, paths, base_dir, report_date, timeout):
+    """
+    Worker entry point: renders one record's PDFs.
+    Returns (record id, {kind: seconds}, error or None).
+    """
+    if timeout and hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    timings = {}
+    try:
+        score = int(float(record.get("score", 5)))
+        name = record.get("name") or "Valued Elf-Enthusiast"
+        verdict = record.get("verdict_title", "Sleigh or Nay?")
+        santa_comment = record.get("santa_comment", "Ho Ho Ho!")
+        cert_template, report_template = templates_for(score)
+
+        if "certificate" in paths:
+            start = time.perf_counter()
+            stream = pdf_generator.create_certificate_pdf(
+                name=name,
+                verdict=verdict,
+                score=score,
+                comment=santa_comment,
+                template_path=cert_template
+            )
+            if stream is None:
+                raise RuntimeError("certificate generation returned None")
+            _write_atomic(paths["certificate"], stream)
+            timings["certificate"] = time.perf_counter() - start
+
+        if "case_file" in paths:
+            start = time.perf_counter()
+            stream = pdf_generator.create_roast_report(
+                name=name,
+                verdict=verdict,
+                score=score,
+                roast_content=record.get("roast_content", "No roast found."),
+                santa_comment=santa_comment,
+                pil_images=_load_images(record.get("images") or [], base_dir),
+                template_path=report_template,
+                report_date=report_date
+            )
+            if stream is None:
+                raise RuntimeError("case file generation returned None")
+            _write_atomic(paths["case_file"], stream)
+            timings["case_file"] = time.perf_counter() - start
+
+        return record["id"], timings, None
+    except RecordTimeout:
+        return record["id"], timings, f"timed out after {timeout}s"
+    except Exception as e:
+        return record["id"], timings, str(e)
+    finally:
+        if timeout and hasattr(signal, "setitimer"):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def merge_pdfs(paths, merged_path):
+    """Concatenates the rendered PDFs into one print-ready file."""
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    for path in paths:
+        for page in PdfReader(path).pages:
+            writer.add_page(page)
+    with open(merged_path, "wb") as f:
+        writer.write(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render certificates and case files in bulk.")
+    parser.add_argument("records", help="JSONL or CSV file of verdict records")
+    parser.add_argument("--out-dir", default="bulk_output", help="Directory for the rendered PDFs")
+    parser.add_argument("--kind", choices=KINDS + ("both",), default="both", help="Which documents to render")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-record timeout in seconds (0 disables)")
+    parser.add_argument("--date", default=None, help="Date printed on case files (default: today)")
+    parser.add_argument("--merge", default=None, help="Also write every rendered PDF into this single file")
+    parser.add_argument("--force", action="store_true", help="Re-render records whose PDFs already exist")
+    args = parser.parse_args(argv)
+
+    kinds = KINDS if args.kind == "both" else (args.kind,)
+    base_dir = os.path.dirname(os.path.abspath(args.records))
+    report_date = args.date or datetime.now().strftime('%B %d, %Y')
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    records = load_records(args.records)
+    all_paths = [output_paths(record, args.out_dir, kinds) for record in records]
+
+    # Resume: only render the documents that are not on disk yet
+    pending = []
+    for record, paths in zip(records, all_paths):
+        missing = {k: p for k, p in paths.items() if args.force or not os.path.exists(p)}
+        if missing:
+            pending.append((record, missing))
+
+    skipped = len(records) - len(pending)
+    print(f"{len(records)} records, {skipped} already rendered, {len(pending)} to render")
+
+    doc_times = []
+    failures = []
+    start = time.perf_counter()
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [
+                pool.submit(render_record, record, missing, base_dir, report_date, args.timeout)
+                for record, missing in pending
+            ]
+            for done, future in enumerate(as_completed(futures), 1):
+                record_id, timings, error = future.result()
+                doc_times.extend(timings.values())
+                if error:
+                    failures.append((record_id, error))
+                    print(f"[{done}/{len(pending)}] {record_id} FAILED: {error}")
+                else:
+                    print(f"[{done}/{len(pending)}] {record_id} ok")
+    elapsed = time.perf_counter() - start
+
+    # --- Throughput Summary ---
+    docs = len(doc_times)
+    rate = docs / elapsed if elapsed > 0 else 0.0
+    print(f"Rendered {docs} documents in {elapsed:.2f}s ({rate:.1f} docs/sec)")
+    if docs:
+        print(f"Per document: p50 {percentile(doc_times, 50) * 1000:.0f} ms, "
+              f"p95 {percentile(doc_times, 95) * 1000:.0f} ms")
+    if failures:
+        print(f"{len(failures)} records failed; rerun to retry them")
+
+    if args.merge:
+        existing = [p for paths in all_paths for p in paths.values() if os.path.exists(p)]
+        merge_pdfs(existing, args.merge)
+        print(f"Merged {len(existing)} documents into {args.merge}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
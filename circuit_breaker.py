@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+from collections import deque
+
+import metrics
+
+# --- Configuration ---
+WINDOW = int(os.environ.get("ELF_BREAKER_WINDOW", "20"))                # recent calls considered
+MIN_CALLS = int(os.environ.get("ELF_BREAKER_MIN_CALLS", "5"))           # before the breaker may trip
+FAILURE_RATE = float(os.environ.get("ELF_BREAKER_FAILURE_RATE", "0.5")) # bad calls / window to trip
+SLOW_CALL_SECONDS = float(os.environ.get("ELF_BREAKER_SLOW_SECONDS", "30"))
+OPEN_SECONDS = float(os.environ.get("ELF_BREAKER_OPEN_SECONDS", "30"))  # before a recovery probe
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+metrics.describe("sleigh_circuit_open", "1 while the Gemini circuit breaker is open or half-open.")
+
+
+class CircuitBreaker:
+    """
+    Trips when too many recent calls failed or were slow. While open, callers
+    are refused immediately; after OPEN_SECONDS one probe call is let through
+    (half-open) and its outcome closes or re-opens the breaker. Every allowed
+    call gets a permit, so only the probe's own outcome decides.
+    """
+
+    def __init__(self, window=WINDOW, min_calls=MIN_CALLS, failure_rate=FAILURE_RATE,
+                 slow_call_seconds=SLOW_CALL_SECONDS, open_seconds=OPEN_SECONDS):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)  # True = bad (failed or slow)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probe = None  # permit of the half-open probe in flight
+
+    def allow(self):
+        """
+        Returns a permit if a real call may be made now, else None. The permit
+        goes back in record_success, record_failure or release.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return object()
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probe = None
+            if self.state == HALF_OPEN and self._probe is None:
+                self._probe = object()
+                return self._probe
+            return None
+
+    def record_success(self, permit, latency):
+        with self._lock:
+            slow = latency >= self.slow_call_seconds
+            if self.state == HALF_OPEN:
+                if permit is not self._probe:
+                    return  # Let through before the breaker opened; only the probe decides
+                if slow:
+                    self._trip()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    print("Circuit breaker closed: Elf-GPT recovered")
+                return
+            self._outcomes.append(slow)
+            self._check()
+
+    def record_failure(self, permit):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if permit is self._probe:
+                    self._trip()
+                return
+            self._outcomes.append(True)
+            self._check()
+
+    def release(self, permit):
+        """
+        Ends an allowed call that produced no verdict on the endpoint's health
+        (e.g. cancelled by its caller). If it was the half-open probe, the next
+        call may probe instead.
+        """
+        with self._lock:
+            if permit is self._probe:
+                self._probe = None
+
+    def _check(self):
+        if self.state != CLOSED or len(self._outcomes) < self.min_calls:
+            return
+        bad = sum(self._outcomes)
+        if bad / len(self._outcomes) >= self.failure_rate:
+            self._trip()
+
+    def _trip(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe = None
+        print(f"Circuit breaker open: serving provisional verdicts for {self.open_seconds:.0f}s")
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def get_breaker():
+    """Returns the process-wide breaker guarding the Gemini call."""
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker()
+            metrics.gauge("sleigh_circuit_open", lambda: 0 if _breaker.state == CLOSED else 1)
+        return _breaker
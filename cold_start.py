@@ -0,0 +1,245 @@
+"""
+Cold-start and per-rerun cost of app.py, checked against a committed budget.
+
+    python cold_start.py                  # compare against cold_start_budget.json
+    python cold_start.py --update-budget  # re-record the budget
+    python cold_start.py --top 20         # list more of the slowest imports
+
+Measures, each as the median over --repeat fresh servers:
+
+    app_imports_ms   app.py's top-level imports in a fresh interpreter after
+                     Streamlit itself (python -X importtime)
+    server_ready_ms  `streamlit run app.py` until /_stcore/health answers
+    first_run_ms     the first page of the first session: the first script
+                     run, which pays for the app's module imports
+    rerun_ms         p50 of later reruns of the home screen, the fixed cost
+                     every widget interaction pays
+
+Also printed, but not budgeted: the slowest packages behind app_imports_ms,
+what the deferred imports (model SDK, PDF libraries, Stripe) cost when they
+load at first use, the server's own script_run timings and its RSS after the
+first page. The server runs against the fake model (see load_test.py), so the
+model SDK is not imported during the measurement, and without the background
+warm-up (warmup.py), whose template renders would otherwise compete with the
+page views being timed. Wall times depend on the
+machine: re-record the budget when the reference machine changes. Exits 1 if
+any measure is over budget.
+"""
+import argparse
+import ast
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import load_test
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(ROOT_DIR, "app.py")
+BUDGET_PATH = os.path.join(ROOT_DIR, "cold_start_budget.json")
+
+MEASURES = ("app_imports_ms", "server_ready_ms", "first_run_ms", "rerun_ms")
+# Imported at first use instead of at start-up; their cost is reported separately
+DEFERRED_IMPORTS = ("google.generativeai", "pdf_generator", "stripe")
+MARKER = "--app imports--"
+
+
+def app_imports():
+    """Modules app.py imports unconditionally at the top level (try blocks included)."""
+    with open(APP_PATH, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    names = []
+
+    def visit(nodes):
+        for node in nodes:
+            if isinstance(node, ast.Import):
+                names.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0:
+                names.append(node.module)
+            elif isinstance(node, ast.Try):
+                visit(node.body)
+
+    visit(tree.body)
+    return names
+
+
+def _importtime(before, after):
+    """
+    Imports `before`, then `after`, in a fresh interpreter with -X importtime.
+    Returns [(self us, cumulative us, indented name)] for the modules `after` loaded.
+    """
+    code = "".join(f"import {name}\n" for name in before)
+    code += f"import sys\nsys.stderr.write({MARKER!r} + '\\n')\n"
+    code += "".join(f"import {name}\n" for name in after)
+    env = dict(os.environ, PYTHONWARNINGS="ignore")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT_DIR, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import failed: {proc.stderr.strip().splitlines()[-1]}")
+    lines = proc.stderr.split(MARKER + "\n", 1)[1].splitlines()
+    rows = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def _total_ms(rows):
+    """Cumulative time of the outermost imports, which covers everything beneath them."""
+    return sum(cum for _, cum, name in rows if not name.startswith("  ")) / 1000
+
+
+def measure_imports():
+    """Returns (total ms, {root package: self ms}) for app.py's start-up imports."""
+    rows = _importtime(["streamlit"], app_imports())
+    by_package = {}
+    for self_us, _, name in rows:
+        package = name.strip().split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us / 1000
+    return _total_ms(rows), by_package
+
+
+def measure_deferred():
+    """What each deferred import costs on top of the start-up imports, in ms."""
+    before = ["streamlit"] + app_imports()
+    return {name: _total_ms(_importtime(before, [name])) for name in DEFERRED_IMPORTS}
+
+
+def measure_server(args):
+    """One fresh server: time to healthy, first page, then args.reruns reruns."""
+    server_args = argparse.Namespace(latency="fixed:0", error_rate=0.0, malformed_rate=0.0, payloads=None,
+                                     server_log=args.server_log, prefetch=False, warm_up=False)
+    start = time.perf_counter()
+    server = load_test.Server(server_args)
+    ready = time.perf_counter() - start
+    try:
+        with load_test.Session(server.base_url, args.timeout) as session:
+            t0 = time.perf_counter()
+            session.rerun()
+            first_run = time.perf_counter() - t0
+            rss = server.rss_mb()
+            reruns = []
+            for _ in range(args.reruns):
+                t0 = time.perf_counter()
+                session.rerun()
+                reruns.append(time.perf_counter() - t0)
+        script_run = server.metrics().get("histograms", {}).get('sleigh_stage_seconds{stage="script_run"}')
+    finally:
+        server.stop()
+    return {
+        "server_ready_ms": ready * 1000,
+        "first_run_ms": first_run * 1000,
+        "rerun_ms": statistics.median(reruns) * 1000,
+    }, script_run, rss
+
+
+def environment():
+    import PIL
+    import streamlit
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "streamlit": streamlit.__version__,
+        "pillow": PIL.__version__,
+    }
+
+
+def compare(results, budget, args):
+    """Returns a message for every measure beyond its budget."""
+    over = []
+    for name, value in results.items():
+        base = budget.get(name)
+        if base is None:
+            continue
+        if value > base * (1 + args.tolerance) and value - base > args.floor_ms:
+            over.append(f"{name} {base:.0f} -> {value:.0f} ms")
+    return over
+
+
+def _change(new, old):
+    if not old:
+        return "   new"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app.py cold start and rerun cost against a budget.")
+    parser.add_argument("--budget", default=BUDGET_PATH, help="Budget JSON file")
+    parser.add_argument("--update-budget", action="store_true", help="Write the results as the new budget")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh servers (and import runs); the median is kept")
+    parser.add_argument("--reruns", type=int, default=10, help="Reruns timed per server after the first page")
+    parser.add_argument("--top", type=int, default=8, help="Slowest start-up import packages to list")
+    parser.add_argument("--tolerance", type=float, default=0.50, help="Allowed fractional slowdown")
+    parser.add_argument("--floor-ms", type=float, default=50.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-step timeout in seconds")
+    parser.add_argument("--server-log", default=None, help="Append the app's output to this file")
+    args = parser.parse_args(argv)
+
+    budget = {}
+    if os.path.exists(args.budget):
+        with open(args.budget, encoding="utf-8") as f:
+            budget = json.load(f).get("measures", {})
+    elif not args.update_budget:
+        print(f"No budget at {args.budget}; run with --update-budget to record one")
+
+    samples = {name: [] for name in MEASURES}
+    by_package = {}
+    script_runs = []
+    rss = []
+    for i in range(args.repeat):
+        print(f"Run {i + 1}/{args.repeat}...", flush=True)
+        total, packages = measure_imports()
+        samples["app_imports_ms"].append(total)
+        by_package = packages
+        server, script_run, server_rss = measure_server(args)
+        for name, value in server.items():
+            samples[name].append(value)
+        if script_run:
+            script_runs.append(script_run)
+        if server_rss is not None:
+            rss.append(server_rss)
+    results = {name: round(statistics.median(values), 1) for name, values in samples.items()}
+
+    print(f"\n{'measure':<20} {'ms':>8} {'budget':>8} {'':>7}")
+    for name, value in results.items():
+        base = budget.get(name)
+        print(f"{name:<20} {value:>8.0f} {base if base is not None else '-':>8} {_change(value, base):>7}")
+    if rss:
+        print(f"server RSS after first page: {statistics.median(rss):.0f} MB")
+    if script_runs:
+        last = script_runs[-1]
+        print(f"server script_run: p50 {last['p50'] * 1000:.0f} ms, p99 {last['p99'] * 1000:.0f} ms "
+              f"over {last['count']} runs")
+
+    print(f"\nslowest start-up imports (self time by package, last run)")
+    for package, ms in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"   {package:<28} {ms:>8.1f} ms")
+    print("deferred imports (paid at first use)")
+    for name, ms in measure_deferred().items():
+        print(f"   {name:<28} {ms:>8.1f} ms")
+
+    if args.update_budget:
+        with open(args.budget, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "repeat": args.repeat, "reruns": args.reruns,
+                       "measures": results}, f, indent=2)
+            f.write("\n")
+        print(f"\nBudget written to {args.budget}")
+        return 0
+
+    over = compare(results, budget, args)
+    for message in over:
+        print(f"OVER BUDGET {message}")
+    if budget and not over:
+        print(f"\n{len(results)} measures within budget")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
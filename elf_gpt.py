@@ -0,0 +1,267 @@
+import os
+import threading
+import time
+
+import circuit_breaker
+import image_prep
+import local_verdict
+import metrics
+import retry_policy
+import single_flight
+import verdict_cache
+import verdict_parser
+
+metrics.describe("sleigh_gemini_tokens_total", "Gemini tokens billed, by kind (prompt, output, total).")
+metrics.describe("sleigh_provisional_verdicts_total", "Provisional verdicts served while the circuit was open.")
+metrics.describe("sleigh_verdict_cache_total", "Verdict cache lookups, by result.")
+
+MODEL_NAME = 'gemini-2.5-flash-preview-09-2025'
+WARM_UP_TIMEOUT = 10  # seconds
+# Hard deadline for one verdict, across all retries and hedges. Each RPC is
+# cancelled when its share expires, so the worker thread is freed.
+REQUEST_TIMEOUT = float(os.environ.get("ELF_REQUEST_TIMEOUT", "60"))
+# Stream the response so the UI can show fields before generation finishes
+STREAMING = os.environ.get("ELF_STREAMING", "1") == "1"
+# Answer from fake_gemini instead of the real endpoint (load tests, offline dev)
+FAKE_MODEL = os.environ.get("ELF_FAKE_MODEL", "0") == "1"
+
+PROMPT = """
+    You are ELF-GPT 1.0, a sarcastic, trendy, and slightly judgmental Christmas Elf who's extremely online and fluent in both Gen-Z and Millennial culture. 
+    Analyze these photo(s) for "Christmas Spirit". 
+    
+    Your Output must be valid JSON with the following keys:
+    - "a_verdict_title": A short punchy title (e.g., "It's a Total SLEIGH!" or "Bah Humbug... So NAY.")
+    - "b_score": A number between 1 and 10.
+    - "c_roast_content": A paragraph of feedback mixing Gen-Z and Millennial slang. 
+      * If the score is high (7-10): Give high praise using terms like "slay", "no cap", "bussin", "it's giving Christmas vibes", "main character energy", "living your best life", "goals AF", "chef's kiss", "periodt", "understood the assignment"
+      * If the score is low (1-6): Roast them playfully using terms like "mid", "L", "not it", "big yikes", "cringe", "giving Grinch energy", "that's a no from me dawg", "oof", "this ain't it chief", "low-key embarrassing", "the bare minimum", "Netflix and no chill vibes"
+      Be funny, specific to the image details, and mix both generational slang naturally. Don't force it - let it flow conversationally.
+    - "d_santa_comment": A one-liner from Santa using either wholesome millennial phrases ("You're doing amazing, sweetie") or Gen-Z humor ("Bestie... we need to talk")
+    """
+
+# Structured output: the API constrains the response to this schema. The SDK's
+# Schema has no property ordering, so fields stream in alphabetical order; the
+# prefixes make that title, score, roast, comment, so the UI can show the title
+# and score while the roast is still generating. PROMPT asks for the same
+# names; they are mapped back on parsing.
+SCHEMA_FIELDS = {
+    "a_verdict_title": "verdict_title",
+    "b_score": "score",
+    "c_roast_content": "roast_content",
+    "d_santa_comment": "santa_comment",
+}
+VERDICT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "a_verdict_title": {"type": "STRING"},
+        "b_score": {"type": "INTEGER"},
+        "c_roast_content": {"type": "STRING"},
+        "d_santa_comment": {"type": "STRING"},
+    },
+    "required": list(SCHEMA_FIELDS),
+}
+
+GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": VERDICT_SCHEMA,
+}
+
+# --- Client Holder ---
+# One configured model per process. genai.configure() resets the SDK's cached
+# clients (and their connections), so it must only run when the key changes.
+_model = None
+_model_key = None
+_model_lock = threading.Lock()
+
+
+def get_model(api_key):
+    """Returns the process-wide GenerativeModel, configuring the SDK on first use."""
+    global _model, _model_key
+    with _model_lock:
+        if FAKE_MODEL:
+            if _model is None:
+                # Only here: it imports google.api_core (and grpc) for its errors
+                import fake_gemini
+                _model = fake_gemini.FakeModel.from_env()
+            return _model
+        if _model is None or _model_key != api_key:
+            # Imported here, not at module load: the SDK takes most of a second
+            # to import, and the first model use is the warm-up thread
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            _model = genai.GenerativeModel(MODEL_NAME, generation_config=GENERATION_CONFIG)
+            _model_key = api_key
+        return _model
+
+
+health = {"ready": False, "latency": None, "error": None}
+
+
+def warm_up(api_key):
+    """
+    Creates the model and makes one cheap call (count_tokens) so the connection
+    is open before the first real request. Returns True if the endpoint answered.
+    """
+    if not api_key:
+        health["error"] = "Missing API Key"
+        return False
+
+    start = time.time()
+    try:
+        get_model(api_key).count_tokens(
+            "ping", request_options={"timeout": WARM_UP_TIMEOUT, "retry": None}
+        )
+        health.update(ready=True, latency=time.time() - start, error=None)
+        return True
+    except Exception as e:
+        health.update(ready=False, latency=None, error=str(e))
+        print(f"Elf-GPT warm-up failed: {e}")
+        return False
+
+
+# Recent call latencies; their p95 decides when a hedged request fires
+_latency = retry_policy.LatencyTracker()
+# Verdict calls in flight, keyed like the verdict cache
+_in_flight = single_flight.SingleFlight("verdict")
+
+
+def _stream_text(response, on_field, ctx):
+    """
+    Reads a streamed response, reporting each JSON field as it completes.
+    Stops early if a hedged rival won; the abandoned stream is cancelled.
+    """
+    parser = verdict_parser.IncrementalVerdictParser(field_names=SCHEMA_FIELDS)
+    for chunk in response:
+        ctx.check()
+        try:
+            text = chunk.text
+        except ValueError:
+            continue  # Chunk without text parts (e.g. only finish metadata)
+        for key, value in parser.feed(text):
+            if ctx.claim():
+                on_field(key, value)
+    return parser.buffer
+
+
+def _record_usage(response):
+    """Adds the response's token usage to the metrics counters."""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return
+    metrics.inc("sleigh_gemini_tokens_total", {"kind": "prompt"}, usage.prompt_token_count)
+    metrics.inc("sleigh_gemini_tokens_total", {"kind": "output"}, usage.candidates_token_count)
+    metrics.inc("sleigh_gemini_tokens_total", {"kind": "total"}, usage.total_token_count)
+
+
+def _attempt(model, inputs, on_field, timeout, ctx):
+    """One model call. Raises on failure so the retry policy can classify it."""
+    with metrics.timed("gemini_call"):
+        response = model.generate_content(
+            inputs,
+            stream=on_field is not None,
+            request_options={"timeout": timeout, "retry": None}
+        )
+        if on_field is not None:
+            text = _stream_text(response, on_field, ctx)
+        else:
+            text = response.text
+    ctx.check()
+    _record_usage(response)
+
+    # Tolerates fences, trailing prose and truncation; clamps score to 1-10
+    result, outcome = verdict_parser.parse_verdict(text, field_names=SCHEMA_FIELDS)
+    if result is None:
+        raise retry_policy.VerdictParseError("No verdict in model response")
+    return result, outcome
+
+
+def _call_model(images, image_parts, api_key, on_field, cancel, cache, cache_key):
+    """The model call behind a cache miss, with breaker, retries and cache fill. Raises on failure."""
+    if cancel is not None and cancel.is_set():
+        return None
+    inputs = [PROMPT]
+    inputs.extend(image_parts)
+
+    # Endpoint failing or crawling: answer instantly with a provisional verdict
+    breaker = circuit_breaker.get_breaker()
+    permit = breaker.allow()
+    if permit is None:
+        print("Circuit open: serving a provisional verdict")
+        metrics.inc("sleigh_provisional_verdicts_total")
+        return local_verdict.local_verdict(images)
+
+    # Every exit that records neither outcome hands the breaker's probe slot back
+    recorded = False
+    try:
+        # Transient errors are retried with backoff inside REQUEST_TIMEOUT
+        model = get_model(api_key)
+        # Only streamed attempts check for cancellation between chunks, so only
+        # they can be hedged: a losing blocking call would run on to its timeout
+        policy = retry_policy.RetryPolicy(budget=REQUEST_TIMEOUT, tracker=_latency, cancel=cancel,
+                                          hedging=retry_policy.HEDGING and on_field is not None)
+        start = time.time()
+        try:
+            result, outcome = policy.call(
+                lambda timeout, ctx: _attempt(model, inputs, on_field, timeout, ctx)
+            )
+        except Exception:
+            if cancel is not None and cancel.is_set():
+                # Abandoned by the caller, not a sign of a failing endpoint
+                print("Elf-GPT call cancelled")
+                return None
+            breaker.record_failure(permit)
+            recorded = True
+            raise
+        breaker.record_success(permit, time.time() - start)
+        recorded = True
+    finally:
+        if not recorded:
+            breaker.release(permit)
+
+    # A repaired verdict is served once, but the next request asks the model again
+    if outcome == "ok":
+        cache.put(cache_key, result)
+    return result
+
+
+def get_elf_verdict(images, api_key, on_field=None, cancel=None):
+    """
+    Sends images to Gemini and returns JSON verdict.
+    If on_field is given the response is streamed and on_field(key, value) is
+    called from the worker thread as each field of the verdict completes.
+    Setting the optional cancel event abandons the call; it then returns None.
+    """
+    if not api_key:
+        # DO NOT use st.error here, it runs in a thread!
+        print("Missing API Key")
+        return None
+
+    try:
+        # Downscaled, metadata-free JPEGs instead of full-resolution photos
+        image_parts = image_prep.prepare_for_model(images)
+
+        # Same photos + same prompt = same verdict, no model call needed
+        cache = verdict_cache.get_verdict_cache()
+        cache_key = verdict_cache.verdict_key(image_parts, PROMPT, MODEL_NAME)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print("Verdict cache hit")
+            metrics.inc("sleigh_verdict_cache_total", {"result": "hit"})
+            return cached
+        metrics.inc("sleigh_verdict_cache_total", {"result": "miss"})
+
+        # Identical requests already in flight (double taps, other tabs) share one call
+        result, shared = _in_flight.do(
+            cache_key,
+            lambda publish: _call_model(images, image_parts, api_key,
+                                        publish if on_field is not None else None, cancel, cache, cache_key),
+            on_field=on_field,
+            cancel=cancel,
+        )
+        if shared and result is not None:
+            print("Joined an identical in-flight verdict")
+            result = dict(result)
+        return result
+    except Exception as e:
+        print(f"Elf-GPT crashed: {e}") 
+        return None
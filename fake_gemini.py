@@ -0,0 +1,204 @@
+"""
+Local stand-in for the Gemini model, for load tests and offline development.
+
+Set ELF_FAKE_MODEL=1 and elf_gpt.get_model() returns a FakeModel instead of
+the real client. It answers generate_content() and count_tokens() like the SDK
+does (streamed chunks with .text, usage_metadata, google.api_core errors) after
+a simulated delay, so everything around the model call runs unchanged.
+
+Configuration (environment):
+    ELF_FAKE_LATENCY         fixed:S | uniform:A:B | normal:MEAN:SD |
+                             lognormal:MEDIAN:SIGMA | exp:MEAN  (seconds)
+    ELF_FAKE_ERROR_RATE      share of calls that fail with a 503/429
+    ELF_FAKE_MALFORMED_RATE  share of calls that return truncated JSON
+    ELF_FAKE_PAYLOADS        JSONL file of verdict dicts to answer with
+"""
+import json
+import math
+import os
+import random
+import threading
+import time
+
+try:
+    from google.api_core import exceptions as api_exceptions
+    api_core_available = True
+except ImportError:
+    api_core_available = False
+
+# --- Configuration ---
+LATENCY = os.environ.get("ELF_FAKE_LATENCY", "lognormal:3:0.4")
+ERROR_RATE = float(os.environ.get("ELF_FAKE_ERROR_RATE", "0"))
+MALFORMED_RATE = float(os.environ.get("ELF_FAKE_MALFORMED_RATE", "0"))
+PAYLOADS_PATH = os.environ.get("ELF_FAKE_PAYLOADS", "")
+
+# Share of the delay spent before the first streamed chunk
+FIRST_CHUNK_SHARE = 0.4
+STREAM_CHUNKS = 8
+# Same per-image cost the real API bills for a small image
+TOKENS_PER_IMAGE = 258
+
+DEFAULT_PAYLOADS = [
+    {
+        "verdict_title": "It's a Total SLEIGH!",
+        "score": 9,
+        "roast_content": "The lights are twinkling, the tree understood the assignment and the whole vibe is main character energy. No cap, this is goals AF. Chef's kiss, periodt.",
+        "santa_comment": "You're doing amazing, sweetie.",
+    },
+    {
+        "verdict_title": "Lowkey Festive, Highkey Mid",
+        "score": 6,
+        "roast_content": "One sad strand of tinsel is doing all the heavy lifting here. It's giving bare minimum, bestie. Not an L, but not it either.",
+        "santa_comment": "Bestie... we need to talk.",
+    },
+    {
+        "verdict_title": "Bah Humbug... So NAY.",
+        "score": 3,
+        "roast_content": "Big yikes. This has Netflix and no chill vibes with a side of Grinch energy. This ain't it chief, the elves are crying into their cocoa.",
+        "santa_comment": "Ho ho... no.",
+    },
+]
+
+
+def parse_latency(spec):
+    """Turns a spec like "lognormal:3:0.4" into a function returning a delay in seconds."""
+    kind, _, rest = spec.partition(":")
+    try:
+        args = [float(a) for a in rest.split(":")] if rest else []
+        if kind == "fixed" and len(args) == 1:
+            return lambda rng: args[0]
+        if kind == "uniform" and len(args) == 2:
+            return lambda rng: rng.uniform(args[0], args[1])
+        if kind == "normal" and len(args) == 2:
+            return lambda rng: max(0.0, rng.gauss(args[0], args[1]))
+        if kind == "lognormal" and len(args) == 2:
+            return lambda rng: rng.lognormvariate(math.log(args[0]), args[1])
+        if kind == "exp" and len(args) == 1:
+            return lambda rng: rng.expovariate(1.0 / args[0])
+    except ValueError:
+        pass
+    raise ValueError(f"Unrecognised latency spec: {spec!r}")
+
+
+def load_payloads(path):
+    """Reads verdict dicts from a JSONL file."""
+    payloads = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                payloads.append(json.loads(line))
+    if not payloads:
+        raise ValueError(f"No payloads in {path}")
+    return payloads
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Response:
+    """Non-streamed response: the whole text at once."""
+
+    def __init__(self, text, usage):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class _StreamResponse:
+    """Streamed response: iterating yields chunks, spaced out over the remaining delay."""
+
+    def __init__(self, text, usage, delay):
+        self._text = text
+        self._delay = delay
+        self.usage_metadata = usage
+
+    def __iter__(self):
+        size = max(1, math.ceil(len(self._text) / STREAM_CHUNKS))
+        pieces = [self._text[i:i + size] for i in range(0, len(self._text), size)]
+        for piece in pieces:
+            time.sleep(self._delay / len(pieces))
+            yield _Chunk(piece)
+
+
+class _TokenCount:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+
+def _server_error(rng):
+    if not api_core_available:
+        return ConnectionError("fake Gemini: service unavailable")
+    if rng.random() < 0.5:
+        return api_exceptions.ServiceUnavailable("fake Gemini: service unavailable")
+    return api_exceptions.TooManyRequests("fake Gemini: quota exceeded")
+
+
+def _deadline_error():
+    if not api_core_available:
+        return TimeoutError("fake Gemini: deadline exceeded")
+    return api_exceptions.DeadlineExceeded("fake Gemini: deadline exceeded")
+
+
+class FakeModel:
+    """Answers like GenerativeModel after a delay drawn from the latency spec."""
+
+    def __init__(self, latency=LATENCY, error_rate=ERROR_RATE, malformed_rate=MALFORMED_RATE,
+                 payloads=None, seed=None):
+        self._sample = parse_latency(latency)
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.payloads = payloads or DEFAULT_PAYLOADS
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls):
+        payloads = load_payloads(PAYLOADS_PATH) if PAYLOADS_PATH else None
+        return cls(payloads=payloads)
+
+    def _draw(self):
+        # random.Random is not safe to share between threads without a lock
+        with self._lock:
+            self.calls += 1
+            return (self._sample(self._rng), self._rng.random(), self._rng.random(),
+                    self._rng.choice(self.payloads))
+
+    def count_tokens(self, contents, request_options=None):
+        return _TokenCount(max(1, len(str(contents)) // 4))
+
+    def generate_content(self, contents, stream=False, request_options=None):
+        timeout = (request_options or {}).get("timeout")
+        delay, error_roll, malformed_roll, payload = self._draw()
+
+        if error_roll < self.error_rate:
+            # Errors come back quickly, like a real 503/429
+            time.sleep(min(delay, 0.2 * delay + 0.05))
+            with self._lock:
+                raise _server_error(self._rng)
+        if timeout is not None and delay > timeout:
+            time.sleep(max(0.0, timeout))
+            raise _deadline_error()
+
+        text = json.dumps(payload)
+        if malformed_roll < self.malformed_rate:
+            text = text[:len(text) // 2]
+
+        images = sum(1 for part in contents if isinstance(part, dict))
+        prompt_chars = sum(len(part) for part in contents if isinstance(part, str))
+        usage = _Usage(images * TOKENS_PER_IMAGE + prompt_chars // 4, max(1, len(text) // 4))
+
+        if stream:
+            time.sleep(delay * FIRST_CHUNK_SHARE)
+            return _StreamResponse(text, usage, delay * (1 - FIRST_CHUNK_SHARE))
+        time.sleep(delay)
+        return _Response(text, usage)
@@ -0,0 +1,182 @@
+"""
+Local Stripe stand-in for exercising the payment ledger without a Stripe account.
+
+Replays signed checkout events at the webhook receiver (payments.py), signed
+the way Stripe signs them, and can serve the one Stripe API call the app makes
+(GET /v1/checkout/sessions/<id>) for the fallback lookup.
+
+    # App side
+    STRIPE_WEBHOOK_PORT=8502 STRIPE_WEBHOOK_SECRET=whsec_test streamlit run app.py
+
+    # Deliver 20 paid checkouts, then a bad signature that must be rejected
+    python fake_stripe.py replay --url http://localhost:8502/stripe/webhook --secret whsec_test --count 20
+    python fake_stripe.py replay --url http://localhost:8502/stripe/webhook --secret wrong --count 1 --expect 400
+
+    # A paid checkout for a result token shown in the app's payment link, then
+    # open http://localhost:8501/?session_id=cs_test_demo to land on that result
+    python fake_stripe.py replay --url ... --secret whsec_test --session-id cs_test_demo --reference <token>
+
+    # Replay recorded events (one JSON event per line, e.g. from `stripe events list`)
+    python fake_stripe.py replay --url ... --secret whsec_test --file events.jsonl
+
+    # Mock API for the fallback; point the SDK at it with stripe.api_base
+    python fake_stripe.py api --port 12111 --paid cs_test_a,cs_test_b
+
+Replay prints the HTTP status for every delivery and exits 1 if any delivery
+got an unexpected status.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stripe's libraries reject signatures older than this by default
+DEFAULT_TOLERANCE = 300  # seconds
+
+
+def checkout_session(session_id=None, payment_status="paid", amount_total=499, currency="usd",
+                     client_reference_id=None):
+    """A checkout.session object with the fields the app reads."""
+    return {
+        "id": session_id or f"cs_test_{uuid.uuid4().hex}",
+        "object": "checkout.session",
+        "mode": "payment",
+        "status": "complete",
+        "payment_status": payment_status,
+        "amount_total": amount_total,
+        "currency": currency,
+        "client_reference_id": client_reference_id,
+    }
+
+
+def event(session, event_type="checkout.session.completed"):
+    """Wraps a checkout session in an event envelope."""
+    return {
+        "id": f"evt_{uuid.uuid4().hex}",
+        "object": "event",
+        "type": event_type,
+        "created": int(time.time()),
+        "livemode": False,
+        "data": {"object": session},
+    }
+
+
+def sign(payload, secret, timestamp=None):
+    """The Stripe-Signature header for a raw body: t=<time>,v1=HMAC-SHA256(secret, "<t>.<body>")."""
+    timestamp = int(time.time()) if timestamp is None else int(timestamp)
+    signed = f"{timestamp}.".encode("ascii") + payload
+    digest = hmac.new(secret.encode("utf-8"), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def deliver(url, evt, secret, timestamp=None):
+    """POSTs one signed event; returns the receiver's HTTP status, or None if unreachable."""
+    payload = json.dumps(evt).encode("utf-8")
+    request = urllib.request.Request(url, data=payload, method="POST", headers={
+        "Content-Type": "application/json",
+        "Stripe-Signature": sign(payload, secret, timestamp),
+    })
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except urllib.error.URLError as e:
+        print(f"Delivery failed: {e.reason}")
+        return None
+
+
+def load_events(path):
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+    return events
+
+
+class _ApiHandler(BaseHTTPRequestHandler):
+    sessions = {}  # session id -> checkout session
+
+    def do_GET(self):
+        prefix = "/v1/checkout/sessions/"
+        path = self.path.split("?", 1)[0]
+        session = self.sessions.get(path[len(prefix):]) if path.startswith(prefix) else None
+        if session is None:
+            status, body = 404, {"error": {"type": "invalid_request_error", "message": "No such checkout.session"}}
+        else:
+            status, body = 200, session
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_api(port, sessions):
+    """Serves GET /v1/checkout/sessions/<id> for the given sessions until interrupted."""
+    _ApiHandler.sessions = {s["id"]: s for s in sessions}
+    server = ThreadingHTTPServer(("127.0.0.1", port), _ApiHandler)
+    print(f"Mock Stripe API at http://127.0.0.1:{port} ({len(sessions)} sessions)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Stripe stand-in for the payment ledger.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    replay = sub.add_parser("replay", help="Deliver signed checkout events to a webhook URL")
+    replay.add_argument("--url", required=True, help="Webhook URL, e.g. http://localhost:8502/stripe/webhook")
+    replay.add_argument("--secret", required=True, help="Signing secret the events are signed with")
+    replay.add_argument("--file", default=None, help="JSONL file of events to replay instead of generated ones")
+    replay.add_argument("--count", type=int, default=1, help="Generated paid checkouts to deliver")
+    replay.add_argument("--session-id", default=None, help="Checkout session id for a single generated event")
+    replay.add_argument("--reference", default=None, help="client_reference_id (result token) on generated events")
+    replay.add_argument("--stale", type=int, default=0, help="Sign with a timestamp this many seconds old")
+    replay.add_argument("--expect", type=int, default=None,
+                        help="Expected status (default 200, or 400 for --stale beyond the tolerance)")
+
+    api = sub.add_parser("api", help="Serve GET /v1/checkout/sessions/<id>")
+    api.add_argument("--port", type=int, default=12111)
+    api.add_argument("--paid", default="", help="Comma-separated session ids to report as paid")
+    api.add_argument("--unpaid", default="", help="Comma-separated session ids to report as unpaid")
+    args = parser.parse_args(argv)
+
+    if args.command == "api":
+        sessions = [checkout_session(s) for s in args.paid.split(",") if s]
+        sessions += [checkout_session(s, payment_status="unpaid") for s in args.unpaid.split(",") if s]
+        serve_api(args.port, sessions)
+        return 0
+
+    if args.file:
+        events = load_events(args.file)
+    else:
+        events = [event(checkout_session(args.session_id, client_reference_id=args.reference))
+                  for _ in range(args.count)]
+    timestamp = time.time() - args.stale if args.stale else None
+    expect = args.expect if args.expect is not None else (400 if args.stale > DEFAULT_TOLERANCE else 200)
+    failures = 0
+    for evt in events:
+        status = deliver(args.url, evt, args.secret, timestamp)
+        session_id = (evt.get("data") or {}).get("object", {}).get("id", "-")
+        print(f"{evt.get('type', '?'):<45} {session_id:<45} {status or 'unreachable'}")
+        failures += status != expect
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
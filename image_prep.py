@@ -0,0 +1,79 @@
+import io
+import math
+import os
+
+from PIL import Image
+
+import metrics
+
+# --- Configuration ---
+# Long edge cap in pixels (0 keeps the original size), output format and quality
+MAX_EDGE = int(os.environ.get("ELF_IMAGE_MAX_EDGE", "1024"))
+FORMAT = os.environ.get("ELF_IMAGE_FORMAT", "JPEG").upper()  # JPEG or WEBP
+QUALITY = int(os.environ.get("ELF_IMAGE_QUALITY", "80"))
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+metrics.describe("sleigh_image_tokens_estimated_total", "Estimated image input tokens, before and after preprocessing.")
+metrics.describe("sleigh_image_bytes_sent_total", "Bytes of preprocessed image data sent to the model.")
+
+
+def estimate_image_tokens(width, height):
+    """
+    Rough Gemini image token count: 258 tokens for images up to 384px,
+    otherwise 258 per 768x768 tile.
+    """
+    if width <= 384 and height <= 384:
+        return 258
+    return math.ceil(width / 768) * math.ceil(height / 768) * 258
+
+
+def preprocess_image(img, max_edge=None, fmt=None, quality=None):
+    """
+    Downscales, strips metadata and re-encodes one image for the model.
+    Returns (blob, size) where blob is a {"mime_type", "data"} dict the Gemini SDK
+    accepts as a content part.
+    """
+    max_edge = MAX_EDGE if max_edge is None else max_edge
+    fmt = (fmt or FORMAT).upper()
+    quality = QUALITY if quality is None else quality
+    if fmt not in MIME_TYPES:
+        fmt = "JPEG"
+
+    out = img
+    if max_edge and max(img.size) > max_edge:
+        out = img.copy()
+        out.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    if out.mode != "RGB":
+        out = out.convert("RGB")
+    elif out is img:
+        out = img.copy()
+    out.info = {}  # Drop EXIF, ICC and any other metadata
+
+    buffer = io.BytesIO()
+    if fmt == "WEBP":
+        out.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        out.save(buffer, format="JPEG", quality=quality, optimize=True)
+
+    return {"mime_type": MIME_TYPES[fmt], "data": buffer.getvalue()}, out.size
+
+
+def prepare_for_model(images, max_edge=None, fmt=None, quality=None):
+    """Preprocesses every image and logs the before/after size and token estimates."""
+    parts = []
+    for img in images:
+        with metrics.timed("preprocess"):
+            blob, size = preprocess_image(img, max_edge=max_edge, fmt=fmt, quality=quality)
+        w, h = img.size
+        metrics.inc("sleigh_image_tokens_estimated_total", {"when": "before"}, estimate_image_tokens(w, h))
+        metrics.inc("sleigh_image_tokens_estimated_total", {"when": "after"}, estimate_image_tokens(*size))
+        metrics.inc("sleigh_image_bytes_sent_total", value=len(blob["data"]))
+        print(
+            f"Image prep: {w}x{h} (~{w * h * 3 // 1024} KB raw, ~{estimate_image_tokens(w, h)} tokens) -> "
+            f"{size[0]}x{size[1]} {blob['mime_type']} {len(blob['data']) // 1024} KB, "
+            f"~{estimate_image_tokens(*size)} tokens"
+        )
+        parts.append(blob)
+    return parts
@@ -0,0 +1,493 @@
+"""
+End-to-end load test for app.py against the local Gemini stand-in.
+
+Starts `streamlit run app.py` with ELF_FAKE_MODEL=1 (see fake_gemini.py) and
+drives it with headless sessions that speak Streamlit's websocket protocol the
+way a browser tab does: open the page, upload photos, press Submit, wait for
+the results screen, then download the certificate and the case file.
+
+    python load_test.py                                   # 1, 4 and 16 concurrent sessions
+    python load_test.py --concurrency 8,32 --sessions 64
+    python load_test.py --latency exp:4 --error-rate 0.05 --json load.json
+
+Each concurrency level gets a fresh server, so caches and memory do not carry
+over between levels. Reported per level: sessions/sec, client-side p50/p95
+per stage, server-side stage timings from the metrics endpoint and the
+server's RSS (Linux only) before, at peak and after the run. Photos are unique
+per session so every Submit reaches the model; pass --same-photos to measure
+the verdict cache instead. --think-time pauses between upload and Submit, like
+a user typing a name; with --prefetch the model call starts during that pause
+(ELF_PREFETCH, see prefetch.py).
+
+    python load_test.py --concurrency 4 --think-time 3 --prefetch
+
+Needs the Streamlit version from requirements.txt; the protocol handling
+here follows its BackMsg/ForwardMsg messages.
+"""
+import argparse
+import io
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(ROOT_DIR, "app.py")
+
+STAGES = ("open", "upload", "submit", "download_certificate", "download_case_file", "session")
+# Server-side stages worth showing next to the client view (see metrics.timed)
+SERVER_STAGES = ("upload_decode", "preprocess", "gemini_call", "parse", "pdf_certificate", "pdf_report")
+SERVER_START_TIMEOUT = 60  # seconds
+RSS_SAMPLE_INTERVAL = 0.25  # seconds
+# 4:3, a typical phone photo after the browser hands it over untouched
+PHOTO_SIZE = (4032, 3024)
+PHOTO_QUALITY = 90
+USER_NAME = "Load Test Elf"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _photo(seed):
+    """A JPEG whose bytes differ per seed, so verdicts don't come from the cache."""
+    from PIL import Image, ImageDraw
+
+    img = Image.linear_gradient("L").resize(PHOTO_SIZE).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((seed % 997, seed % 991, seed % 997 + 400, seed % 991 + 300),
+                   fill=(seed * 37 % 256, seed * 91 % 256, seed * 53 % 256))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=PHOTO_QUALITY)
+    return buf.getvalue()
+
+
+def _rss_mb(pid):
+    """Resident memory of a process from /proc; None where that isn't available."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class Server:
+    """A `streamlit run app.py` child process wired to the fake model."""
+
+    def __init__(self, args):
+        self.port = _free_port()
+        self.metrics_port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        env = dict(os.environ)
+        env.update({
+            "ELF_FAKE_MODEL": "1",
+            "ELF_FAKE_LATENCY": args.latency,
+            "ELF_FAKE_ERROR_RATE": str(args.error_rate),
+            "ELF_FAKE_MALFORMED_RATE": str(args.malformed_rate),
+            "SLEIGH_METRICS_PORT": str(self.metrics_port),
+            "SLEIGH_METRICS_LOG_INTERVAL": "0",
+            "ELF_PREFETCH": "1" if args.prefetch else "0",
+            "SLEIGH_WARMUP_BACKGROUND": "1" if args.warm_up else "0",
+        })
+        if args.payloads:
+            env["ELF_FAKE_PAYLOADS"] = os.path.abspath(args.payloads)
+        # Submit refuses to run without a key, even though the fake ignores it
+        env.setdefault("GEMINI_API_KEY", "load-test")
+        cmd = [
+            sys.executable, "-m", "streamlit", "run", APP_PATH,
+            f"--server.port={self.port}",
+            "--server.address=127.0.0.1",
+            "--server.headless=true",
+            "--server.fileWatcherType=none",
+            # Uploads come from this script, not from a page carrying the XSRF cookie
+            "--server.enableXsrfProtection=false",
+            "--browser.gatherUsageStats=false",
+        ]
+        self.log = open(args.server_log, "ab") if args.server_log else subprocess.DEVNULL
+        self.process = subprocess.Popen(cmd, cwd=ROOT_DIR, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+        self._wait_healthy()
+
+    def _wait_healthy(self):
+        import requests
+
+        deadline = time.time() + SERVER_START_TIMEOUT
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"streamlit exited with code {self.process.returncode}")
+            try:
+                if requests.get(self.base_url + "/_stcore/health", timeout=1).ok:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.25)
+        raise RuntimeError(f"streamlit did not come up within {SERVER_START_TIMEOUT}s")
+
+    def rss_mb(self):
+        return _rss_mb(self.process.pid)
+
+    def metrics(self):
+        """The app's metrics snapshot (metrics.snapshot()), or {} if unreachable."""
+        import requests
+
+        try:
+            return requests.get(f"http://127.0.0.1:{self.metrics_port}/metrics.json", timeout=5).json()
+        except (requests.RequestException, ValueError):
+            return {}
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        if self.log is not subprocess.DEVNULL:
+            self.log.close()
+
+
+class RssSampler:
+    """Polls the server's RSS in the background and keeps the peak."""
+
+    def __init__(self, server):
+        self._server = server
+        self._stop = threading.Event()
+        self.peak = server.rss_mb()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="rss-sampler")
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            rss = self._server.rss_mb()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.peak
+
+
+class Session:
+    """
+    One headless browser tab. Each rerun() sends the widget values and reads
+    ForwardMsgs until the script run settles, keeping the last screen's elements.
+    """
+
+    def __init__(self, base_url, timeout):
+        from websockets.sync.client import connect
+
+        self.base_url = base_url
+        self.timeout = timeout
+        ws_url = base_url.replace("http://", "ws://", 1) + "/_stcore/stream"
+        self._connection = connect(ws_url, subprotocols=["streamlit"], max_size=None, open_timeout=timeout)
+        self.ws = self._connection.__enter__()
+        self.session_id = None
+        self.elements = []
+        self._request_ids = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._connection.__exit__(*exc_info)
+
+    def _recv(self, deadline):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise TimeoutError("no reply from the app in time")
+        msg = ForwardMsg()
+        msg.ParseFromString(self.ws.recv(timeout=remaining))
+        return msg
+
+    def rerun(self, widget_states=()):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        back = BackMsg()
+        back.rerun_script.query_string = ""
+        back.rerun_script.widget_states.widgets.extend(widget_states)
+        self.ws.send(back.SerializeToString())
+
+        deadline = time.time() + self.timeout
+        elements = []
+        while True:
+            msg = self._recv(deadline)
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                # st.rerun() starts over with a new run; only the last screen counts
+                self.session_id = msg.new_session.initialize.session_id
+                elements = []
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                elements.append(msg.delta.new_element)
+            elif kind == "script_finished":
+                if msg.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RuntimeError("app.py failed to compile")
+                if msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    self.elements = elements
+                    return elements
+
+    def widgets(self, kind):
+        return [getattr(e, kind) for e in self.elements if e.WhichOneof("type") == kind]
+
+    def exception(self):
+        for e in self.widgets("exception"):
+            return e.message
+        return None
+
+    def upload(self, uploader, files):
+        """PUTs files the way the browser does and returns the uploader's widget state."""
+        import requests
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        state = WidgetState(id=uploader.id)
+        for name, data in files:
+            file_id = str(uuid.uuid4())
+            response = requests.put(
+                f"{self.base_url}/_stcore/upload_file/{self.session_id}/{file_id}",
+                files={"file": (name, data, "image/jpeg")},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            info = state.file_uploader_state_value.uploaded_file_info.add()
+            info.name = name
+            info.size = len(data)
+            info.file_id = file_id
+        return state
+
+    def download(self, button):
+        """Clicks a deferred st.download_button: asks the app to build the file, then fetches it."""
+        import requests
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        self._request_ids += 1
+        request_id = str(self._request_ids)
+        back = BackMsg()
+        back.backend_operation_request.request_id = request_id
+        back.backend_operation_request.session_id = self.session_id
+        back.backend_operation_request.deferred_file.file_id = button.deferred_file_id
+        self.ws.send(back.SerializeToString())
+
+        deadline = time.time() + self.timeout
+        while True:
+            msg = self._recv(deadline)
+            if (msg.WhichOneof("type") == "backend_operation_response"
+                    and msg.backend_operation_response.request_id == request_id):
+                break
+        response = msg.backend_operation_response
+        if response.error_msg:
+            raise RuntimeError(response.error_msg)
+        body = requests.get(self.base_url + response.deferred_file.url, timeout=self.timeout)
+        body.raise_for_status()
+        if not body.content.startswith(b"%PDF"):
+            raise RuntimeError(f"{button.label}: not a PDF")
+        return len(body.content)
+
+
+def run_session(base_url, photos, timeout, think_time=0.0):
+    """
+    One user going through upload -> Submit -> results -> downloads, pausing
+    think_time seconds before Submit. The pause is not part of any stage.
+    Returns (stage timings, error or None, whether the verdict was provisional).
+    """
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+    times = {}
+    start = time.perf_counter()
+
+    def stage(name, fn):
+        t0 = time.perf_counter()
+        result = fn()
+        times[name] = time.perf_counter() - t0
+        return result
+
+    try:
+        with stage("open", lambda: Session(base_url, timeout)) as session:
+            session.rerun()
+            uploader = session.widgets("file_uploader")[0]
+
+            def upload():
+                state = session.upload(uploader, photos)
+                session.rerun([state])
+                return state
+            upload_state = stage("upload", upload)
+            if think_time:
+                time.sleep(think_time)
+                start += think_time
+
+            submit = next(b for b in session.widgets("button") if b.label == "Submit")
+            name_input = session.widgets("text_input")[0]
+            stage("submit", lambda: session.rerun([
+                upload_state,
+                WidgetState(id=name_input.id, string_value=USER_NAME),
+                WidgetState(id=submit.id, trigger_value=True),
+            ]))
+            buttons = session.widgets("download_button")
+            if not buttons:
+                alerts = [a.body for a in session.widgets("alert")]
+                return times, f"submit: {session.exception() or next(iter(alerts), 'no results screen')}", False
+            provisional = any("provisional" in a.body for a in session.widgets("alert"))
+
+            certificate = next(b for b in buttons if "Certificate" in b.label)
+            case_file = next(b for b in buttons if "Case File" in b.label)
+            stage("download_certificate", lambda: session.download(certificate))
+            stage("download_case_file", lambda: session.download(case_file))
+        times["session"] = time.perf_counter() - start
+        return times, None, provisional
+    except Exception as e:
+        return times, f"{type(e).__name__}: {e}", False
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_level(args, concurrency):
+    """Runs args.sessions sessions, `concurrency` at a time, against a fresh server."""
+    server = Server(args)
+    try:
+        # One untimed session pays for imports, template parsing and model warm-up
+        run_session(server.base_url, [("warmup.jpg", _photo(0))], args.timeout)
+        rss_start = server.rss_mb()
+        sampler = RssSampler(server)
+
+        def one(index):
+            seed = 1 if args.same_photos else index + 1
+            photos = [(f"photo_{i}.jpg", _photo(seed * 7 + i)) for i in range(args.photos)]
+            return run_session(server.base_url, photos, args.timeout, args.think_time)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(one, range(args.sessions)))
+        elapsed = time.perf_counter() - start
+
+        rss_peak = sampler.stop()
+        rss_end = server.rss_mb()
+        server_metrics = server.metrics()
+    finally:
+        server.stop()
+
+    stages = {}
+    for name in STAGES:
+        samples = [times[name] for times, error, _ in outcomes if not error and name in times]
+        stages[name] = {
+            "p50_ms": round(statistics.median(samples) * 1000, 1) if samples else None,
+            "p95_ms": round(_percentile(samples, 0.95) * 1000, 1) if samples else None,
+        }
+    histograms = server_metrics.get("histograms", {})
+    server_stages = {}
+    for name in SERVER_STAGES:
+        hist = histograms.get(f'sleigh_stage_seconds{{stage="{name}"}}')
+        if hist:
+            server_stages[name] = {"count": hist["count"], "p50_ms": round(hist["p50"] * 1000, 1),
+                                   "p95_ms": round(hist["p95"] * 1000, 1)}
+
+    errors = [error for _, error, _ in outcomes if error]
+    completed = len(outcomes) - len(errors)
+    return {
+        "concurrency": concurrency,
+        "sessions": len(outcomes),
+        "completed": completed,
+        "failed": len(errors),
+        "provisional": sum(1 for _, error, provisional in outcomes if provisional and not error),
+        "elapsed_s": round(elapsed, 2),
+        "sessions_per_s": round(completed / elapsed, 3) if elapsed else 0.0,
+        "stages": stages,
+        "server_stages": server_stages,
+        "server_rss_mb": {
+            "start": round(rss_start, 1) if rss_start is not None else None,
+            "peak": round(rss_peak, 1) if rss_peak is not None else None,
+            "end": round(rss_end, 1) if rss_end is not None else None,
+        },
+        "errors": sorted(set(errors))[:10],
+    }
+
+
+def _ms(value):
+    return f"{value:>8.0f}" if value is not None else f"{'-':>8}"
+
+
+def _mb(value):
+    return f"{value:>7.0f}" if value is not None else f"{'-':>7}"
+
+
+def print_level(result):
+    rss = result["server_rss_mb"]
+    print(f"\n== {result['concurrency']} concurrent: {result['completed']}/{result['sessions']} sessions in "
+          f"{result['elapsed_s']:.1f}s = {result['sessions_per_s']:.2f} sessions/s "
+          f"({result['provisional']} provisional)")
+    print(f"   server RSS MB: start {_mb(rss['start'])}  peak {_mb(rss['peak'])}  end {_mb(rss['end'])}")
+    print(f"   {'client stage':<24} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, stats in result["stages"].items():
+        print(f"   {name:<24} {_ms(stats['p50_ms'])} {_ms(stats['p95_ms'])}")
+    if result["server_stages"]:
+        print(f"   {'server stage':<24} {'p50 ms':>8} {'p95 ms':>8} {'count':>7}")
+        for name, stats in result["server_stages"].items():
+            print(f"   {name:<24} {_ms(stats['p50_ms'])} {_ms(stats['p95_ms'])} {stats['count']:>7}")
+    for error in result["errors"]:
+        print(f"   FAILED: {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test app.py end to end against a fake Gemini model.")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrent session counts")
+    parser.add_argument("--sessions", type=int, default=None,
+                        help="Sessions per level (default: 4x the concurrency, at least 8)")
+    parser.add_argument("--photos", type=int, choices=(1, 2), default=1, help="Photos uploaded per session")
+    parser.add_argument("--same-photos", action="store_true", help="Upload identical photos (verdict cache hits)")
+    parser.add_argument("--latency", default="lognormal:3:0.4", help="Fake model latency spec, see fake_gemini.py")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of model calls that fail with 503/429")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of model replies with broken JSON")
+    parser.add_argument("--payloads", default=None, help="JSONL file of verdicts for the fake model to return")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="Seconds between upload and Submit, as if typing a name")
+    parser.add_argument("--prefetch", action="store_true", help="Run the app with ELF_PREFETCH=1")
+    parser.add_argument("--no-warm-up", dest="warm_up", action="store_false",
+                        help="Run the app with SLEIGH_WARMUP_BACKGROUND=0 (no background warm-up)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-step timeout in seconds")
+    parser.add_argument("--server-log", default=None, help="Append the app's output to this file")
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    # Fail fast on a bad spec instead of inside every server
+    import fake_gemini
+    fake_gemini.parse_latency(args.latency)
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    results = []
+    for concurrency in levels:
+        sessions = args.sessions or max(8, 4 * concurrency)
+        print(f"Running {sessions} sessions at concurrency {concurrency}...", flush=True)
+        level_args = argparse.Namespace(**{**vars(args), "sessions": sessions})
+        result = run_level(level_args, concurrency)
+        results.append(result)
+        print_level(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"latency": args.latency, "error_rate": args.error_rate,
+                       "malformed_rate": args.malformed_rate, "photos": args.photos,
+                       "think_time": args.think_time, "prefetch": args.prefetch, "warm_up": args.warm_up,
+                       "levels": results}, f, indent=2)
+            f.write("\n")
+        print(f"\nResults written to {args.json}")
+    return 1 if any(r["failed"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import hashlib
+
+from PIL import ImageStat
+
+# Used when Elf-GPT is unreachable. Roasts are picked from simple colour
+# statistics, so they're generic but still depend on the photo.
+TITLES = {
+    True: "Provisionally... a SLEIGH?",
+    False: "Provisionally... kinda NAY?",
+}
+
+ROASTS = {
+    "festive": [
+        "The backup elves are squinting through the snowstorm and honestly? The red-and-green energy is giving main character Christmas. Low-key chef's kiss, but Elf-GPT will have the final word.",
+        "Even with our fancy elf brain on a cocoa break, this palette understood the assignment. Festive colours, no cap. Provisional slay.",
+    ],
+    "bright": [
+        "It's bright, it's glowing, it's giving twinkle lights. The backup elves are vibing, but they can't see tinsel from here so don't get too comfy.",
+        "Lots of sparkle energy detected by our very basic elf sensors. Could be Christmas lights, could be a ring light. We'll let it slide... for now.",
+    ],
+    "dark": [
+        "It's a little dark in here, bestie. Are we celebrating Christmas or hiding from the Grinch? The backup elves need more fairy lights, periodt.",
+        "Our emergency elf can barely see anything. Very 'Netflix and no chill' lighting. Add some twinkle and try again when Elf-GPT is back.",
+    ],
+    "plain": [
+        "The backup elves are giving this a polite nod. Not much red, not much green, very 'the bare minimum' of holiday colour. Mid, but fixable.",
+        "Our stand-in elf sees... vibes. Just not Christmas vibes. This ain't it chief, but Elf-GPT might disagree when it's back from the North Pole.",
+    ],
+}
+
+SANTA_COMMENTS = [
+    "Ho ho hold on, my head elf is on break. Check back soon!",
+    "Bestie... the real verdict is coming, I promise.",
+    "You're doing amazing, sweetie. Probably.",
+]
+
+
+def _image_features(img):
+    """Returns (brightness 0-255, red share, green share) from a small copy of the image."""
+    small = img.copy()
+    small.thumbnail((128, 128))
+    if small.mode != "RGB":
+        small = small.convert("RGB")
+    r, g, b = ImageStat.Stat(small).mean
+    total = (r + g + b) or 1.0
+    return (r + g + b) / 3.0, r / total, g / total
+
+
+def local_verdict(images):
+    """
+    Builds a verdict without calling the model. The result carries
+    "provisional": True so the UI can say it's a stand-in.
+    """
+    features = [_image_features(img) for img in images] or [(128.0, 1 / 3, 1 / 3)]
+    brightness = sum(f[0] for f in features) / len(features)
+    red = sum(f[1] for f in features) / len(features)
+    green = sum(f[2] for f in features) / len(features)
+
+    if red > 0.38 or green > 0.38:
+        mood, score = "festive", 7
+    elif brightness > 170:
+        mood, score = "bright", 6
+    elif brightness < 70:
+        mood, score = "dark", 4
+    else:
+        mood, score = "plain", 5
+
+    # Same photo, same wording
+    seed = int(hashlib.sha256(repr(features).encode()).hexdigest(), 16)
+    roasts = ROASTS[mood]
+
+    return {
+        "verdict_title": TITLES[score >= 7],
+        "score": score,
+        "roast_content": roasts[seed % len(roasts)],
+        "santa_comment": SANTA_COMMENTS[seed % len(SANTA_COMMENTS)],
+        "provisional": True,
+    }
@@ -0,0 +1,241 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Configuration ---
+# Prometheus scrape endpoint (http://host:PORT/metrics) and/or a periodic JSON
+# log line. Both are off unless configured.
+METRICS_PORT = int(os.environ.get("SLEIGH_METRICS_PORT", "0"))
+LOG_INTERVAL = float(os.environ.get("SLEIGH_METRICS_LOG_INTERVAL", "0"))
+
+# Seconds; covers a 5 ms decode up to a 60 s model call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+QUANTILES = (0.5, 0.95, 0.99)
+RESERVOIR_SIZE = 1024
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> Histogram
+_gauges = {}      # (name, labels) -> callable
+_help = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted((labels or {}).items()))
+
+
+class Histogram:
+    """Cumulative buckets for Prometheus plus a window of recent samples for quantiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def quantile(self, q):
+        samples = sorted(self.recent)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def describe(name, text):
+    """Sets the # HELP text exported for a metric family."""
+    _help[name] = text
+
+
+def inc(name, labels=None, value=1):
+    """Adds to a counter."""
+    with _lock:
+        key = _key(name, labels)
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def counter(name, labels=None):
+    """A counter's current value (0 if never incremented)."""
+    with _lock:
+        return _counters.get(_key(name, labels), 0)
+
+
+def observe(name, value, labels=None):
+    """Records one sample in a histogram."""
+    with _lock:
+        key = _key(name, labels)
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = Histogram()
+        hist.observe(value)
+
+
+def gauge(name, fn, labels=None):
+    """Registers a gauge whose value is read from fn() at scrape time."""
+    with _lock:
+        _gauges[_key(name, labels)] = fn
+
+
+@contextmanager
+def timed(stage):
+    """Times a block into sleigh_stage_seconds{stage=...}; failures are counted too."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc("sleigh_stage_errors_total", {"stage": stage})
+        raise
+    finally:
+        observe("sleigh_stage_seconds", time.perf_counter() - start, {"stage": stage})
+
+
+describe("sleigh_stage_seconds", "Time spent in each stage of a request, in seconds.")
+describe("sleigh_stage_errors_total", "Stage runs that raised, by stage.")
+
+
+# --- Exposition ---
+def _fmt_labels(labels, extra=None):
+    items = list(labels) + list((extra or {}).items())
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{str(v)}"' for k, v in items)
+    return "{" + body + "}"
+
+
+def render_prometheus():
+    """Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        hists = {k: (h.buckets, list(h.counts), h.count, h.sum, [(q, h.quantile(q)) for q in QUANTILES])
+                 for k, h in _histograms.items()}
+        gauges = dict(_gauges)
+
+    typed = set()
+
+    def header(name, kind):
+        if name not in typed:
+            typed.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+
+    for (name, labels), fn in sorted(gauges.items(), key=lambda kv: kv[0]):
+        try:
+            value = float(fn())
+        except Exception:
+            continue
+        header(name, "gauge")
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+
+    for (name, labels), (buckets, counts, count, total, quantiles) in sorted(hists.items()):
+        header(name, "histogram")
+        for bound, c in zip(buckets, counts):
+            lines.append(f"{name}_bucket{_fmt_labels(labels, {'le': bound})} {c}")
+        lines.append(f"{name}_bucket{_fmt_labels(labels, {'le': '+Inf'})} {count}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {total}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+
+    # Recent-window quantiles, so p50/p95/p99 are readable without PromQL
+    for (name, labels), (_, _, _, _, quantiles) in sorted(hists.items()):
+        header(f"{name}_recent", "gauge")
+        for q, value in quantiles:
+            lines.append(f"{name}_recent{_fmt_labels(labels, {'quantile': q})} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def snapshot():
+    """JSON-friendly view: counters, gauges and per-histogram count/p50/p95/p99."""
+    with _lock:
+        counters = {_flat(k): v for k, v in _counters.items()}
+        hists = {
+            _flat(k): {"count": h.count, **{f"p{int(q * 100)}": round(h.quantile(q), 4) for q in QUANTILES}}
+            for k, h in _histograms.items()
+        }
+        gauges = dict(_gauges)
+    gauge_values = {}
+    for k, fn in gauges.items():
+        try:
+            gauge_values[_flat(k)] = fn()
+        except Exception:
+            pass
+    return {"ts": time.time(), "counters": counters, "gauges": gauge_values, "histograms": hists}
+
+
+def _flat(key):
+    name, labels = key
+    return name + _fmt_labels(labels)
+
+
+# Extra endpoints (path -> callable returning (status, content type, body))
+routes = {
+    "/metrics.json": lambda: (200, "application/json", json.dumps(snapshot(), default=str)),
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            status, ctype, body = 200, "text/plain; version=0.0.4", render_prometheus()
+        elif path in routes:
+            status, ctype, body = routes[path]()
+        else:
+            status, ctype, body = 404, "text/plain", "not found\n"
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the log
+
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def _log_loop(interval):
+    while True:
+        time.sleep(interval)
+        print("METRICS " + json.dumps(snapshot(), default=str))
+
+
+def start_exporters(port=None, log_interval=None):
+    """Starts the scrape endpoint and/or JSON log once per process."""
+    global _started
+    port = METRICS_PORT if port is None else port
+    log_interval = LOG_INTERVAL if log_interval is None else log_interval
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+    if port:
+        try:
+            server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+            threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+            print(f"Metrics available at http://0.0.0.0:{port}/metrics")
+        except OSError as e:
+            # Another worker on this host already owns the port
+            print(f"Metrics endpoint not started on port {port}: {e}")
+    if log_interval:
+        threading.Thread(target=_log_loop, args=(log_interval,), daemon=True, name="metrics-log").start()
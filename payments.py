@@ -0,0 +1,296 @@
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import metrics
+
+# --- Configuration ---
+# Paid checkout sessions are recorded here by the webhook, shared by every
+# worker process on the host
+LEDGER_PATH = os.environ.get("PAYMENT_LEDGER_PATH", "payments.db")
+# Webhook receiver (POST http://host:PORT/stripe/webhook); off unless a port is set
+WEBHOOK_PORT = int(os.environ.get("STRIPE_WEBHOOK_PORT", "0"))
+WEBHOOK_PATH = "/stripe/webhook"
+# Signing secret (whsec_...) from the Stripe dashboard or `stripe listen`
+WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET", "")
+# Reject signed events older than this, like Stripe's own libraries
+SIGNATURE_TOLERANCE = 300  # seconds
+# How long a "not paid (yet)" answer from Stripe is reused before asking again
+RETRIEVE_TTL = float(os.environ.get("PAYMENT_RETRIEVE_TTL", "30"))
+
+PAID_EVENTS = ("checkout.session.completed", "checkout.session.async_payment_succeeded")
+MAX_BODY_BYTES = 1024 * 1024
+
+metrics.describe("sleigh_stripe_events_total", "Verified Stripe webhook events, by type.")
+metrics.describe("sleigh_stripe_events_rejected_total", "Stripe webhook requests rejected (bad signature or payload).")
+metrics.describe("sleigh_payment_lookups_total", "Payment status lookups, by where the answer came from.")
+
+
+class SignatureError(ValueError):
+    """The Stripe-Signature header is missing, malformed, stale or wrong."""
+
+
+def verify_signature(payload, header, secret, tolerance=SIGNATURE_TOLERANCE, now=None):
+    """
+    Checks a Stripe-Signature header ("t=<unix time>,v1=<hex hmac>,...") against
+    the raw request body. The signed string is "<t>.<body>", HMAC-SHA256 keyed
+    with the endpoint's signing secret.
+    """
+    if not secret:
+        raise SignatureError("No webhook signing secret configured")
+    timestamp = None
+    signatures = []
+    for item in (header or "").split(","):
+        key, _, value = item.strip().partition("=")
+        if key == "t":
+            timestamp = value
+        elif key == "v1":
+            signatures.append(value)
+    if not timestamp or not timestamp.isdigit() or not signatures:
+        raise SignatureError("Malformed Stripe-Signature header")
+
+    signed = timestamp.encode("ascii") + b"." + payload
+    expected = hmac.new(secret.encode("utf-8"), signed, hashlib.sha256).hexdigest()
+    if not any(hmac.compare_digest(expected, s) for s in signatures):
+        raise SignatureError("Signature does not match")
+    now = time.time() if now is None else now
+    if tolerance and abs(now - int(timestamp)) > tolerance:
+        raise SignatureError("Timestamp outside the tolerance window")
+
+
+class PaymentLedger:
+    """Checkout sessions seen by the webhook (or confirmed by Stripe), keyed by session id."""
+
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS payments ("
+                "session_id TEXT PRIMARY KEY, payment_status TEXT NOT NULL, "
+                "event_id TEXT, amount_total INTEGER, currency TEXT, recorded_at REAL NOT NULL, "
+                "client_reference_id TEXT)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(payments)")}
+            if "client_reference_id" not in columns:
+                # Ledgers created before checkouts carried a result token
+                conn.execute("ALTER TABLE payments ADD COLUMN client_reference_id TEXT")
+
+    @contextmanager
+    def _connect(self):
+        """One connection per use: committed (or rolled back) and closed on exit."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record(self, session, event_id=None):
+        """Stores a checkout session object; a later 'paid' overwrites an earlier 'unpaid'."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO payments (session_id, payment_status, event_id, amount_total, currency, "
+                "recorded_at, client_reference_id) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET payment_status = excluded.payment_status, "
+                "event_id = excluded.event_id, recorded_at = excluded.recorded_at, "
+                "client_reference_id = COALESCE(excluded.client_reference_id, payments.client_reference_id) "
+                "WHERE payments.payment_status != 'paid'",
+                (session["id"], session.get("payment_status") or "unpaid", event_id,
+                 session.get("amount_total"), session.get("currency"), time.time(),
+                 session.get("client_reference_id"))
+            )
+
+    def status(self, session_id):
+        """The recorded payment_status, or None if the session was never seen."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payment_status FROM payments WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def reference(self, session_id):
+        """The client_reference_id the checkout was opened with, if recorded."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT client_reference_id FROM payments WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger():
+    """Returns the process-wide payment ledger."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = PaymentLedger()
+        return _ledger
+
+
+def handle_event(event):
+    """Records paid-checkout events in the ledger. Returns True if the event was used."""
+    if event.get("type") not in PAID_EVENTS:
+        return False
+    session = (event.get("data") or {}).get("object") or {}
+    if not session.get("id"):
+        return False
+    if event["type"] == "checkout.session.async_payment_succeeded":
+        # Delayed methods (e.g. bank debits) complete as 'unpaid' and succeed later
+        session = dict(session, payment_status="paid")
+    get_ledger().record(session, event_id=event.get("id"))
+    metrics.inc("sleigh_stripe_events_total", {"type": event["type"]})
+    return True
+
+
+def handle_webhook(payload, signature_header, secret=None):
+    """Verifies and applies one webhook delivery. Returns (HTTP status, message)."""
+    try:
+        verify_signature(payload, signature_header, secret or WEBHOOK_SECRET)
+        event = json.loads(payload)
+    except SignatureError as e:
+        metrics.inc("sleigh_stripe_events_rejected_total")
+        return 400, str(e)
+    except ValueError:
+        return 400, "Invalid JSON"
+    try:
+        handle_event(event)
+    except sqlite3.Error as e:
+        # Non-2xx makes Stripe retry the delivery later
+        print(f"Payment ledger write failed: {e}")
+        return 500, "Ledger unavailable"
+    return 200, "ok"
+
+
+# TTL cache of Stripe's answer for sessions the ledger hasn't seen yet
+_retrieved = {}  # session_id -> (checked_at, payment_status, client_reference_id)
+_retrieved_lock = threading.Lock()
+
+
+def _retrieve(session_id, retrieve):
+    """
+    Asks Stripe about a checkout session, reusing the answer for RETRIEVE_TTL.
+    Returns (payment_status, client_reference_id).
+    """
+    with _retrieved_lock:
+        cached = _retrieved.get(session_id)
+    if cached and time.monotonic() - cached[0] < RETRIEVE_TTL:
+        metrics.inc("sleigh_payment_lookups_total", {"source": "cache"})
+        return cached[1], cached[2]
+
+    metrics.inc("sleigh_payment_lookups_total", {"source": "stripe"})
+    with metrics.timed("verify_payment"):
+        session = retrieve(session_id)
+    payment_status = session.payment_status
+    reference = getattr(session, "client_reference_id", None)
+    if payment_status == "paid":
+        # Settled for good: later reruns answer from the ledger
+        try:
+            get_ledger().record({"id": session_id, "payment_status": "paid",
+                                 "amount_total": getattr(session, "amount_total", None),
+                                 "currency": getattr(session, "currency", None),
+                                 "client_reference_id": reference})
+        except sqlite3.Error as e:
+            print(f"Payment ledger write failed: {e}")
+    with _retrieved_lock:
+        now = time.monotonic()
+        for key in [k for k, entry in _retrieved.items() if now - entry[0] >= RETRIEVE_TTL]:
+            del _retrieved[key]
+        _retrieved[session_id] = (now, payment_status, reference)
+    return payment_status, reference
+
+
+def is_paid(session_id, retrieve=None):
+    """
+    True if the checkout session is paid. Looks in the ledger first; for sessions
+    the webhook hasn't delivered yet, falls back to retrieve(session_id) (e.g.
+    stripe.checkout.Session.retrieve), reusing its answer for RETRIEVE_TTL.
+    """
+    if not session_id:
+        return False
+    try:
+        status = get_ledger().status(session_id)
+    except sqlite3.Error as e:
+        print(f"Payment ledger read failed: {e}")
+        status = None
+    if status == "paid":
+        metrics.inc("sleigh_payment_lookups_total", {"source": "ledger"})
+        return True
+    if retrieve is None:
+        return False
+    return _retrieve(session_id, retrieve)[0] == "paid"
+
+
+def client_reference(session_id, retrieve=None):
+    """
+    The client_reference_id a checkout was opened with (the app's result token),
+    from the ledger or, failing that, from retrieve(session_id). None if unknown.
+    """
+    if not session_id:
+        return None
+    try:
+        reference = get_ledger().reference(session_id)
+    except sqlite3.Error as e:
+        print(f"Payment ledger read failed: {e}")
+        reference = None
+    if reference or retrieve is None:
+        return reference
+    return _retrieve(session_id, retrieve)[1]
+
+
+# --- Webhook receiver ---
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path.split("?", 1)[0] != WEBHOOK_PATH:
+            self._reply(404, "not found")
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._reply(413, "too large")
+            return
+        payload = self.rfile.read(length)
+        status, message = handle_webhook(payload, self.headers.get("Stripe-Signature"))
+        self._reply(status, message)
+
+    def _reply(self, status, message):
+        data = (message + "\n").encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def start_webhook_server(port=None):
+    """Starts the webhook receiver once per process, if a port is configured."""
+    global _started
+    port = WEBHOOK_PORT if port is None else port
+    with _start_lock:
+        if _started or not port:
+            return
+        _started = True
+    if not WEBHOOK_SECRET:
+        print("STRIPE_WEBHOOK_SECRET is not set: every webhook delivery will be rejected")
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+        threading.Thread(target=server.serve_forever, daemon=True, name="stripe-webhook").start()
+        print(f"Stripe webhook receiver at http://0.0.0.0:{port}{WEBHOOK_PATH}")
+    except OSError as e:
+        # Another worker on this host already receives the events into the shared ledger
+        print(f"Stripe webhook receiver not started on port {port}: {e}")
@@ -1,8 +1,11 @@
 import io
 import os
 import textwrap
+import threading
 from datetime import datetime
 
+import metrics
+
 # Try importing ReportLab components safely
 try:
     from reportlab.pdfgen import canvas
@@ -18,6 +21,40 @@ try:
 except ImportError:
     pypdf_available = False
 
+# --- Template Registry ---
+# Parsed templates are shared by the whole process and only re-read when the
+# file's mtime changes. Guarded so app.py's importlib.reload() keeps the cache.
+if "_template_cache" not in globals():
+    _template_cache = {}  # abs path -> (mtime, PdfReader)
+    _template_lock = threading.Lock()
+
+def _get_template_reader(template_path):
+    """Returns the parsed template, re-parsing only if the file changed. Caller holds the lock."""
+    path = os.path.abspath(template_path)
+    mtime = os.path.getmtime(path)
+    cached = _template_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "rb") as f:
+        reader = PdfReader(io.BytesIO(f.read()))
+    reader.pages[0]  # Parse the page tree now rather than on first render
+    _template_cache[path] = (mtime, reader)
+    return reader
+
+def get_template_writer(template_path):
+    """
+    Returns a PdfWriter holding a private copy of the template's first page.
+    Merging onto the copy leaves the cached template untouched.
+    """
+    output = PdfWriter()
+    # PdfReader resolves objects lazily from one stream, so copies are serialized
+    with _template_lock:
+        reader = _get_template_reader(template_path)
+        output.add_page(reader.pages[0])
+    return output
+
+@metrics.timed("pdf_certificate")
 def create_certificate_pdf(name, verdict, score, comment, template_path):
     """
     Generates a filled PDF certificate.
@@ -41,16 +78,13 @@ def create_certificate_pdf(name, verdict, score, comment, template_path):
             print(f"Certificate Template missing: {template_path}")
             return packet
             
-        new_pdf = PdfReader(packet)
-        existing_pdf = PdfReader(open(template_path, "rb"))
-        output = PdfWriter()
-        
-        page = existing_pdf.pages[0]
-        page.merge_page(new_pdf.pages[0])
-        output.add_page(page)
-        
-        output_stream = io.BytesIO()
-        output.write(output_stream)
+        with metrics.timed("pdf_merge"):
+            new_pdf = PdfReader(packet)
+            output = get_template_writer(template_path)
+            output.pages[0].merge_page(new_pdf.pages[0])
+            
+            output_stream = io.BytesIO()
+            output.write(output_stream)
         output_stream.seek(0)
         return output_stream
         
@@ -58,6 +92,7 @@ def create_certificate_pdf(name, verdict, score, comment, template_path):
         print(f"Certificate Error: {e}")
         return None
 
+@metrics.timed("pdf_report")
 def create_roast_report(name, verdict, score, roast_content, santa_comment, pil_images, template_path=None, report_date=None):
     """
     Generates a Single-Page 'Case File' PDF.
@@ -218,17 +253,13 @@ def create_roast_report(name, verdict, score, roast_content, santa_comment, pil_
         # --- Template Merging ---
         if template_path and os.path.exists(template_path) and pypdf_available:
             try:
-                content_pdf = PdfReader(buffer)
-                template_pdf = PdfReader(open(template_path, "rb"))
-                output_page = template_pdf.pages[0]
-                content_page = content_pdf.pages[0]
-                output_page.merge_page(content_page)
-                
-                output = PdfWriter()
-                output.add_page(output_page)
-                
-                final_stream = io.BytesIO()
-                output.write(final_stream)
+                with metrics.timed("pdf_merge"):
+                    content_pdf = PdfReader(buffer)
+                    output = get_template_writer(template_path)
+                    output.pages[0].merge_page(content_pdf.pages[0])
+                    
+                    final_stream = io.BytesIO()
+                    output.write(final_stream)
                 final_stream.seek(0)
                 return final_stream
             except Exception as e:
@@ -0,0 +1,49 @@
+import os
+import threading
+
+import admission
+import elf_gpt
+import metrics
+
+# --- Configuration ---
+# Opt-in: start the verdict as soon as the uploads settle, so the model call
+# runs while the user types a name instead of after Submit
+ENABLED = os.environ.get("ELF_PREFETCH", "0") == "1"
+
+metrics.describe("sleigh_prefetch_total", "Verdict prefetches, by outcome (started, attached, cancelled).")
+
+
+class Prefetch:
+    """
+    A verdict requested ahead of Submit for one exact set of photos. Lives in
+    st.session_state; Submit attaches to its ticket instead of queueing a new call.
+    """
+
+    def __init__(self, signature, images, api_key):
+        self.signature = signature
+        self.cancelled = threading.Event()
+        # Streamed fields collect here until Submit shows them
+        self.fields = {}
+        on_field = self.fields.__setitem__ if elf_gpt.STREAMING else None
+        self.ticket = admission.get_controller().submit(
+            elf_gpt.get_elf_verdict, images, api_key, on_field=on_field, cancel=self.cancelled
+        )
+        metrics.inc("sleigh_prefetch_total", {"outcome": "started"})
+
+    def usable(self, signature):
+        """True if this call is for these photos and still on its way to a verdict."""
+        return (signature == self.signature and not self.cancelled.is_set()
+                and not self.ticket.future.cancelled())
+
+    def attach(self):
+        """Hands the ticket to Submit."""
+        metrics.inc("sleigh_prefetch_total", {"outcome": "attached"})
+        return self.ticket
+
+    def cancel(self):
+        """Drops the call from the queue, or stops it at its next chunk or retry."""
+        if self.cancelled.is_set():
+            return
+        self.cancelled.set()
+        self.ticket.cancel()
+        metrics.inc("sleigh_prefetch_total", {"outcome": "cancelled"})
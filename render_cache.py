@@ -0,0 +1,248 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import metrics
+import session_images
+
+# --- Configuration ---
+# Memory tier is always on; the disk tier is shared by worker processes and
+# only enabled when RENDER_CACHE_DIR is set.
+MEMORY_LIMIT_BYTES = int(os.environ.get("RENDER_CACHE_MEMORY_MB", "64")) * 1024 * 1024
+DISK_DIR = os.environ.get("RENDER_CACHE_DIR", "")
+DISK_LIMIT_BYTES = int(os.environ.get("RENDER_CACHE_DISK_MB", "256")) * 1024 * 1024
+# The directory's size is tracked per process, so writes by other workers are
+# only seen when it is rescanned: on eviction, and at least this often
+DISK_RESCAN_SECONDS = 60
+# Eviction goes down to this share of the limit, so it isn't due again on the next write
+DISK_LOW_WATER = 0.9
+
+metrics.describe("sleigh_render_cache_total", "PDF render cache lookups, by result.")
+
+
+def image_digest(img):
+    """Returns a stable digest of a PIL image's pixels, mode and size."""
+    if isinstance(img, session_images.StoredImage):
+        return img.digest
+    # Hashing a 12 MP image is not free, so the digest is kept on the image
+    # object itself (like StoredImage.digest); copies start without one
+    digest = getattr(img, "_render_digest", None)
+    if digest is None:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{img.mode}:{img.size}".encode())
+        h.update(img.tobytes())
+        digest = h.hexdigest()
+        img._render_digest = digest
+    return digest
+
+
+def render_key(func_name, name, verdict, score, text, pil_images, template_path, report_date):
+    """Builds the content address for one rendered document."""
+    template_mtime = None
+    if template_path and os.path.exists(template_path):
+        template_mtime = os.path.getmtime(template_path)
+
+    parts = [
+        func_name,
+        str(name),
+        str(verdict),
+        str(score),
+        str(text),
+        ",".join(image_digest(img) for img in (pil_images or [])),
+        os.path.abspath(template_path) if template_path else "",
+        repr(template_mtime),
+        str(report_date),
+    ]
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class RenderCache:
+    """
+    Two-tier store of rendered PDF bytes: an in-memory LRU bounded by total size,
+    and an optional on-disk directory bounded by total size (oldest files evicted).
+    """
+
+    def __init__(self, memory_limit=MEMORY_LIMIT_BYTES, disk_dir=DISK_DIR, disk_limit=DISK_LIMIT_BYTES):
+        self.memory_limit = memory_limit
+        self.disk_dir = disk_dir
+        self.disk_limit = disk_limit
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None  # None until the directory has been scanned
+        self._disk_scanned_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+
+        data = self._disk_get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._memory_put(key, data)
+        return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._memory_put(key, data)
+        self._disk_put(key, data)
+
+    def _memory_put(self, key, data):
+        if len(data) > self.memory_limit:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pdf")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used for eviction
+            return data
+        except OSError:
+            return None
+
+    def _disk_put(self, key, data):
+        if not self.disk_dir:
+            return
+        try:
+            # Write-then-rename so other workers never read a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError as e:
+            print(f"Render cache write failed: {e}")
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data)
+            due = (self._disk_bytes is None or self._disk_bytes > self.disk_limit
+                   or time.monotonic() - self._disk_scanned_at >= DISK_RESCAN_SECONDS)
+            if due:
+                # Restarts the clock now, so concurrent puts don't all rescan on it
+                self._disk_scanned_at = time.monotonic()
+        if due:
+            self._disk_evict()
+
+    def _disk_evict(self):
+        """Rescans the directory, removes the oldest files beyond the limit and resets the size counter."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith(".pdf"):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+
+        entries.sort()
+        target = self.disk_limit * DISK_LOW_WATER if total > self.disk_limit else self.disk_limit
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_render_cache():
+    """Returns the process-wide render cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RenderCache()
+        return _cache
+
+
+def _cached(key, render):
+    cache = get_render_cache()
+    data = cache.get(key)
+    metrics.inc("sleigh_render_cache_total", {"result": "miss" if data is None else "hit"})
+    if data is None:
+        stream = render()
+        if stream is None:
+            return None
+        data = stream.getvalue()
+        cache.put(key, data)
+    return io.BytesIO(data)
+
+
+def render_certificate(name, verdict, score, comment, template_path):
+    """Cached wrapper around pdf_generator.create_certificate_pdf."""
+    key = render_key("certificate", name, verdict, score, comment, None, template_path, None)
+    # Imported on the first render: ReportLab and pypdf stay out of app start-up
+    import pdf_generator
+    return _cached(key, lambda: pdf_generator.create_certificate_pdf(
+        name=name,
+        verdict=verdict,
+        score=score,
+        comment=comment,
+        template_path=template_path
+    ))
+
+
+def render_roast_report(name, verdict, score, roast_content, santa_comment, pil_images, template_path=None, report_date=None):
+    """
+    Cached wrapper around pdf_generator.create_roast_report. pil_images may be
+    session_images.StoredImage objects; they are only decoded on a cache miss.
+    """
+    if report_date is None:
+        report_date = datetime.now().strftime('%B %d, %Y')
+    text = f"{roast_content}\0{santa_comment}"
+    key = render_key("roast_report", name, verdict, score, text, pil_images, template_path, report_date)
+    import pdf_generator
+    return _cached(key, lambda: pdf_generator.create_roast_report(
+        name=name,
+        verdict=verdict,
+        score=score,
+        roast_content=roast_content,
+        santa_comment=santa_comment,
+        pil_images=[session_images.as_pil(img) for img in (pil_images or [])],
+        template_path=template_path,
+        report_date=report_date
+    ))
@@ -0,0 +1,114 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# --- Configuration ---
+# Verdicts outlive the Streamlit session so the Stripe redirect can pick them
+# up again; shared by every worker process on the host
+SQLITE_PATH = os.environ.get("RESULT_STORE_PATH", "results.db")
+TTL_SECONDS = float(os.environ.get("RESULT_STORE_TTL", str(7 * 24 * 3600)))
+
+# URL-safe and well within Stripe's 200-character client_reference_id
+TOKEN_BYTES = 12
+
+
+def new_token():
+    """A short opaque token for one result; unguessable, since it unlocks the photos."""
+    return secrets.token_urlsafe(TOKEN_BYTES)
+
+
+class StoredResult:
+    """A verdict as it was shown: the verdict dict, the certificate name and the photos."""
+
+    def __init__(self, verdict, name, images):
+        self.verdict = verdict
+        self.name = name
+        self.images = images  # [(jpeg bytes, thumbnail jpeg bytes or None)]
+
+
+class ResultStore:
+    """
+    Results keyed by token, with their compressed photos. Entries expire after
+    the TTL; expired rows are swept whenever a result is saved.
+    """
+
+    def __init__(self, path=SQLITE_PATH, ttl=TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "token TEXT PRIMARY KEY, verdict TEXT NOT NULL, name TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS result_images ("
+                "token TEXT NOT NULL, position INTEGER NOT NULL, data BLOB NOT NULL, thumb BLOB, "
+                "PRIMARY KEY (token, position))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_stored ON results (stored_at)")
+
+    @contextmanager
+    def _connect(self):
+        """One connection per use: committed (or rolled back) and closed on exit."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save(self, token, verdict, name, images):
+        """Stores a result; images are (data, thumb) JPEG byte pairs."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (token, verdict, name, stored_at) VALUES (?, ?, ?, ?)",
+                (token, json.dumps(verdict), name or "", now)
+            )
+            conn.execute("DELETE FROM result_images WHERE token = ?", (token,))
+            conn.executemany(
+                "INSERT INTO result_images (token, position, data, thumb) VALUES (?, ?, ?, ?)",
+                [(token, i, data, thumb) for i, (data, thumb) in enumerate(images)]
+            )
+            expired = now - self.ttl
+            conn.execute(
+                "DELETE FROM result_images WHERE token IN (SELECT token FROM results WHERE stored_at <= ?)",
+                (expired,)
+            )
+            conn.execute("DELETE FROM results WHERE stored_at <= ?", (expired,))
+
+    def load(self, token):
+        """The StoredResult for a token, or None if unknown or expired."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT verdict, name FROM results WHERE token = ? AND stored_at > ?",
+                (token, time.time() - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            images = conn.execute(
+                "SELECT data, thumb FROM result_images WHERE token = ? ORDER BY position", (token,)
+            ).fetchall()
+        return StoredResult(json.loads(row[0]), row[1], [(bytes(d), bytes(t) if t else None) for d, t in images])
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_result_store():
+    """Returns the process-wide result store, or None if its database can't be opened."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = ResultStore()
+            except sqlite3.Error as e:
+                print(f"Result store unavailable: {e}")
+                return None
+        return _store
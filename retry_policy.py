@@ -0,0 +1,235 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import admission
+import metrics
+
+# --- Configuration ---
+MAX_ATTEMPTS = int(os.environ.get("ELF_RETRY_ATTEMPTS", "3"))
+BASE_DELAY = float(os.environ.get("ELF_RETRY_BASE_DELAY", "0.5"))
+MAX_DELAY = float(os.environ.get("ELF_RETRY_MAX_DELAY", "8"))
+# Don't start an attempt with less time than this left in the budget
+MIN_ATTEMPT_SECONDS = 2.0
+# Hedging: fire a second request if the first hasn't answered by the observed p95.
+# No hedge until HEDGE_MIN_SAMPLES latencies have been seen.
+HEDGING = os.environ.get("ELF_HEDGING", "0") == "1"
+HEDGE_MIN_SAMPLES = 20
+
+metrics.describe("sleigh_hedged_requests_total", "Second requests sent because the first was slower than the p95.")
+
+
+class VerdictParseError(Exception):
+    """The model answered but no verdict could be recovered; worth another try."""
+
+
+class AttemptCancelled(Exception):
+    """A hedged attempt lost the race, or the caller abandoned the call, and it stopped early."""
+
+
+_retryable = None
+_retryable_lock = threading.Lock()
+
+
+def retryable_exceptions():
+    """
+    The exception types worth another attempt. Resolved on first use:
+    google.api_core pulls in grpc, which app start-up shouldn't pay for.
+    """
+    global _retryable
+    with _retryable_lock:
+        if _retryable is None:
+            try:
+                from google.api_core import exceptions as api_exceptions
+                api_errors = (
+                    api_exceptions.TooManyRequests,       # 429
+                    api_exceptions.ResourceExhausted,     # 429 (gRPC)
+                    api_exceptions.InternalServerError,   # 500
+                    api_exceptions.BadGateway,            # 502
+                    api_exceptions.ServiceUnavailable,    # 503
+                    api_exceptions.GatewayTimeout,        # 504
+                    api_exceptions.DeadlineExceeded,      # 504 (gRPC)
+                    api_exceptions.Aborted,
+                    api_exceptions.RetryError,
+                )
+            except ImportError:
+                api_errors = ()
+            _retryable = api_errors + (VerdictParseError, ConnectionError, TimeoutError)
+        return _retryable
+
+
+def is_retryable(exc):
+    """Transient server, quota, network and parse failures are retried; anything else is fatal."""
+    return isinstance(exc, retryable_exceptions())
+
+
+class LatencyTracker:
+    """Rolling window of recent successful call latencies."""
+
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct, default=None):
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return default
+        index = min(len(samples) - 1, int(pct / 100.0 * len(samples)))
+        return samples[index]
+
+
+class AttemptContext:
+    """
+    Passed to every attempt. claim() returns True for the attempt allowed to
+    publish partial output; once one attempt claims, its rivals are cancelled.
+    Setting the parent event cancels every attempt of the call.
+    """
+
+    def __init__(self, group=None, parent=None):
+        self.cancelled = threading.Event()
+        self._group = group
+        self._parent = parent
+
+    def claim(self):
+        if self._group is None:
+            return True
+        return self._group.claim(self)
+
+    def check(self):
+        if self.cancelled.is_set() or (self._parent is not None and self._parent.is_set()):
+            raise AttemptCancelled()
+
+
+class _HedgeGroup:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.owner = None
+        self.members = []
+
+    def claim(self, ctx):
+        with self._lock:
+            if self.owner is None:
+                self.owner = ctx
+                for other in self.members:
+                    if other is not ctx:
+                        other.cancelled.set()
+            return self.owner is ctx
+
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff inside an overall latency budget. If the
+    optional cancel event is set, attempts stop and no retries are made.
+    """
+
+    def __init__(self, budget, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY,
+                 hedging=HEDGING, tracker=None, cancel=None):
+        self.budget = budget
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedging = hedging
+        self.tracker = tracker or LatencyTracker()
+        self.cancel = cancel
+
+    def backoff(self, attempt):
+        """Full jitter: uniform in [0, min(max_delay, base * 2^attempt)]."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, attempt_fn):
+        """
+        Calls attempt_fn(timeout, ctx) until it succeeds, fails fatally, runs out
+        of attempts or the budget is spent. Re-raises the last error.
+        """
+        deadline = time.monotonic() + self.budget
+        attempt = 0
+        while True:
+            if self._cancelled():
+                raise AttemptCancelled()
+            remaining = deadline - time.monotonic()
+            start = time.monotonic()
+            try:
+                if self.hedging:
+                    result = self._hedged(attempt_fn, remaining)
+                else:
+                    result = attempt_fn(remaining, AttemptContext(parent=self.cancel))
+                self.tracker.record(time.monotonic() - start)
+                return result
+            except Exception as e:
+                attempt += 1
+                delay = self.backoff(attempt)
+                remaining = deadline - time.monotonic()
+                if (self._cancelled() or not is_retryable(e) or attempt >= self.max_attempts
+                        or remaining - delay < MIN_ATTEMPT_SECONDS):
+                    raise
+                print(f"Elf-GPT attempt {attempt} failed ({type(e).__name__}: {e}); retrying in {delay:.1f}s")
+                if self.cancel is not None:
+                    self.cancel.wait(delay)
+                else:
+                    time.sleep(delay)
+
+    def _cancelled(self):
+        return self.cancel is not None and self.cancel.is_set()
+
+    def _hedged(self, attempt_fn, remaining):
+        """Runs the attempt, and a second copy if the first is slower than the p95."""
+        hedge_after = self.tracker.percentile(95)
+        if hedge_after is None:
+            # Too few samples for a p95 yet: a guessed threshold would only add load
+            return attempt_fn(remaining, AttemptContext(parent=self.cancel))
+        group = _HedgeGroup()
+        deadline = time.monotonic() + remaining
+
+        def launch():
+            ctx = AttemptContext(group, parent=self.cancel)
+            group.members.append(ctx)
+            timeout = deadline - time.monotonic()
+            return _get_hedge_pool().submit(attempt_fn, timeout, ctx), ctx
+
+        primary, primary_ctx = launch()
+        done, _ = wait([primary], timeout=min(hedge_after, remaining))
+        if done or group.owner is not None:
+            # Finished, or already streaming output: no point in a second request
+            return primary.result()
+
+        hedge, hedge_ctx = launch()
+        metrics.inc("sleigh_hedged_requests_total")
+        futures = {primary: primary_ctx, hedge: hedge_ctx}
+        error = None
+        while futures:
+            done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+            for future in done:
+                futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if not isinstance(e, AttemptCancelled):
+                        error = e
+                    continue
+                # Winner: stop the other attempt (streams stop reading and close)
+                for ctx in futures.values():
+                    ctx.cancelled.set()
+                return result
+        raise error or AttemptCancelled()
+
+
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
+
+def _get_hedge_pool():
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            # Room for every admitted call plus one hedge each
+            workers = 2 * admission.MAX_IN_FLIGHT
+            _hedge_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="elf-hedge")
+        return _hedge_pool
@@ -0,0 +1,33 @@
+"""
+Starts the app with a warm process: runs warmup.py's steps first, then
+`streamlit run app.py` in the same interpreter, so the caches it filled are
+the ones the app uses and the port only opens once the process is ready.
+
+    python serve.py --server.port=8501 --server.address=0.0.0.0
+
+Arguments are passed on to `streamlit run app.py`. With SLEIGH_METRICS_PORT
+set, /ready on the metrics endpoint answers 503 during the warm-up and 200
+after it (see warmup.py).
+"""
+import os
+import sys
+
+import metrics
+import warmup
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def main():
+    # Up first, so probes see "not ready" rather than nothing during the warm-up
+    metrics.start_exporters()
+    warmup.start(warmup.api_key_from_config())
+
+    from streamlit.web import cli as stcli
+
+    sys.argv = ["streamlit", "run", APP_PATH] + sys.argv[1:]
+    return stcli.main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
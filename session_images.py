@@ -0,0 +1,221 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+import metrics
+
+# --- Configuration ---
+# Submitted photos are kept per session as capped JPEG bytes, not decoded pixels
+STORE_MAX_EDGE = int(os.environ.get("SESSION_IMAGE_MAX_EDGE", "1600"))
+STORE_QUALITY = int(os.environ.get("SESSION_IMAGE_QUALITY", "85"))
+THUMB_EDGE = 400
+# Compacted images are only as large as the case file draws them (600px)
+COMPACT_EDGE = 600
+COMPACT_QUALITY = 75
+# Total stored bytes across all sessions in this process; beyond it the least
+# recently used idle sessions are compacted, then dropped
+BUDGET_BYTES = int(os.environ.get("SESSION_IMAGE_BUDGET_MB", "128")) * 1024 * 1024
+# A session untouched for this long counts as idle
+IDLE_SECONDS = float(os.environ.get("SESSION_IMAGE_IDLE_SECONDS", "120"))
+
+metrics.describe("sleigh_session_images_total", "Session photo sets compacted or evicted to stay within budget.")
+metrics.describe("sleigh_session_images_bytes", "Bytes of session photos held in this process.")
+metrics.describe("sleigh_session_images_sessions", "Sessions with photos held in this process.")
+
+
+def _encode(img, max_edge, quality):
+    out = img
+    if max(img.size) > max_edge:
+        out = img.copy()
+        out.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    if out.mode != "RGB":
+        out = out.convert("RGB")
+    buffer = io.BytesIO()
+    out.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+class StoredImage:
+    """One photo as JPEG bytes plus a thumbnail; decoded only when pixels are needed."""
+
+    __slots__ = ("data", "thumb", "digest")
+
+    def __init__(self, data, thumb=None):
+        self.data = data
+        self.thumb = thumb
+        self.digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    @classmethod
+    def from_pil(cls, img):
+        return cls(_encode(img, STORE_MAX_EDGE, STORE_QUALITY), _encode(img, THUMB_EDGE, STORE_QUALITY))
+
+    @property
+    def nbytes(self):
+        return len(self.data) + len(self.thumb or b"")
+
+    @property
+    def compact(self):
+        return self.thumb is None
+
+    def to_pil(self):
+        img = Image.open(io.BytesIO(self.data))
+        img.load()
+        return img
+
+    def thumbnail_bytes(self):
+        return self.thumb or self.data
+
+    def compacted(self):
+        """A smaller copy that still fills the case file, without a separate thumbnail."""
+        if self.compact:
+            return self
+        return StoredImage(_encode(self.to_pil(), COMPACT_EDGE, COMPACT_QUALITY))
+
+
+def as_pil(img):
+    """Decodes a StoredImage; PIL images pass through unchanged."""
+    return img.to_pil() if isinstance(img, StoredImage) else img
+
+
+class _Entry:
+    __slots__ = ("images", "last_used", "compacting")
+
+    def __init__(self, images):
+        self.images = images
+        self.last_used = time.monotonic()
+        self.compacting = False
+
+    @property
+    def nbytes(self):
+        return sum(img.nbytes for img in self.images)
+
+
+class SessionImageStore:
+    """
+    Process-wide home for every session's submitted photos. Sessions keep only
+    a key in st.session_state, so compacting or dropping an entry here frees
+    its memory. Accounting is by stored bytes against a fixed budget.
+    """
+
+    def __init__(self, budget=BUDGET_BYTES, idle_seconds=IDLE_SECONDS):
+        self.budget = budget
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> _Entry, least recently used first
+        self.total_bytes = 0
+
+    def put(self, key, pil_images):
+        """Compresses and stores a session's photos, replacing any earlier ones."""
+        self.put_stored(key, [StoredImage.from_pil(img) for img in pil_images])
+
+    def put_stored(self, key, stored):
+        """Stores already-compressed StoredImages (e.g. reloaded from result_store)."""
+        with self._lock:
+            self._discard(key)
+            entry = self._entries[key] = _Entry(stored)
+            self.total_bytes += entry.nbytes
+        self._enforce_budget()
+
+    def get(self, key):
+        """The session's StoredImages ([] if none or evicted); marks the session as active."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return []
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(key)
+            return list(entry.images)
+
+    def discard(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.nbytes
+
+    def _compactable(self, entry):
+        return not entry.compacting and not all(img.compact for img in entry.images)
+
+    def _next_victim(self):
+        """
+        Under the lock: the next entry to compact, or None. Idle sessions are
+        shrunk oldest first, then dropped; only then are active ones shrunk,
+        and a live session is never dropped.
+        """
+        now = time.monotonic()
+        idle = [k for k, e in self._entries.items() if now - e.last_used >= self.idle_seconds]
+        # 1. Shrink idle sessions, oldest first
+        for key in idle:
+            if self._compactable(self._entries[key]):
+                return key
+        # 2. Drop idle sessions, oldest first; their results screen loses the photos
+        for key in idle:
+            if self._entries[key].compacting:
+                continue
+            self._discard(key)
+            metrics.inc("sleigh_session_images_total", {"action": "evict"})
+            if self.total_bytes <= self.budget:
+                return None
+        # 3. Everyone is active: shrink them too
+        for key, entry in self._entries.items():
+            if self._compactable(entry):
+                return key
+        if not any(e.compacting for e in self._entries.values()):
+            print(f"Session images over budget: {self.total_bytes // 1024} KB held by {len(self._entries)} active sessions")
+        return None
+
+    def _enforce_budget(self):
+        """
+        Compacts or drops sessions until the store fits its budget. Re-encoding
+        runs outside the lock: the victim is picked under it, compacted, and
+        swapped in only if the session still holds the same photos.
+        """
+        while True:
+            with self._lock:
+                if self.total_bytes <= self.budget:
+                    return
+                key = self._next_victim()
+                if key is None:
+                    return
+                entry = self._entries[key]
+                entry.compacting = True
+                images = entry.images
+
+            try:
+                compacted = [img.compacted() for img in images]
+            except Exception:
+                with self._lock:
+                    entry.compacting = False
+                raise
+            with self._lock:
+                entry.compacting = False
+                if self._entries.get(key) is entry and entry.images is images:
+                    before = entry.nbytes
+                    entry.images = compacted
+                    self.total_bytes += entry.nbytes - before
+                    metrics.inc("sleigh_session_images_total", {"action": "compact"})
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Returns the process-wide session image store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionImageStore()
+            metrics.gauge("sleigh_session_images_bytes", lambda: _store.total_bytes)
+            metrics.gauge("sleigh_session_images_sessions", lambda: len(_store))
+        return _store
@@ -0,0 +1,97 @@
+import threading
+
+import metrics
+
+# How often a waiting caller checks whether it has been cancelled
+WAIT_POLL_SECONDS = 0.25
+
+metrics.describe("sleigh_single_flight_coalesced_total", "Calls that joined an identical call already in flight.")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False
+        self.fields = []  # (key, value) published so far, replayed to late joiners
+        self.listeners = []
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one execution: the first caller
+    runs the function, callers arriving while it runs wait for its result.
+    Nothing is kept once the call finishes; that is the cache's job.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call in flight
+
+    def do(self, key, fn, on_field=None, cancel=None):
+        """
+        Returns (result, shared). fn(publish) runs at most once at a time per key;
+        publish(key, value) passes streamed fields to every caller's on_field.
+        A caller's cancel event stops its own wait. If the running caller is
+        cancelled, the waiting callers start the call again themselves.
+        """
+        joined = False
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                if on_field is not None:
+                    # Under the lock, so a field is neither missed nor delivered twice
+                    for field in call.fields:
+                        on_field(*field)
+                    call.listeners.append(on_field)
+
+            if leader:
+                return self._lead(key, call, fn, cancel), False
+
+            if not joined:
+                joined = True
+                metrics.inc("sleigh_single_flight_coalesced_total", {"flight": self.name})
+            while not call.done.wait(WAIT_POLL_SECONDS):
+                if cancel is not None and cancel.is_set():
+                    self._unsubscribe(call, on_field)
+                    return None, True
+            if call.abandoned:
+                self._unsubscribe(call, on_field)
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+    def _lead(self, key, call, fn, cancel):
+        try:
+            call.result = fn(lambda k, v: self._publish(call, k, v))
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            call.abandoned = cancel is not None and cancel.is_set()
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _publish(self, call, key, value):
+        with self._lock:
+            call.fields.append((key, value))
+            listeners = list(call.listeners)
+        for listener in listeners:
+            listener(key, value)
+
+    def _unsubscribe(self, call, on_field):
+        if on_field is None:
+            return
+        with self._lock:
+            try:
+                call.listeners.remove(on_field)
+            except ValueError:
+                pass
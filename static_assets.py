@@ -0,0 +1,150 @@
+import base64
+import hashlib
+import os
+import shutil
+import threading
+
+import streamlit as st
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(ROOT_DIR, "assets")
+# Streamlit serves ./static next to the main script at /app/static/ when
+# server.enableStaticServing is on (see .streamlit/config.toml)
+STATIC_DIR = os.path.join(ROOT_DIR, "static")
+STATIC_URL = "/app/static/"
+
+# Images and the stylesheet the UI uses; published once per process under
+# content-hashed names
+PUBLISHED_ASSETS = [
+    "style.css",
+    "logo.png",
+    "elf_gpt.png",
+    "happy_elf.png",
+    "grumpy_elf.png",
+    "sleigh_title.png",
+    "nay_title.png",
+]
+
+_lock = threading.Lock()
+_published = {}  # asset name -> hashed file name
+_header_html = None
+_stylesheet_html = None
+
+
+def static_serving_enabled():
+    try:
+        return bool(st.get_option("server.enableStaticServing"))
+    except Exception:
+        return False
+
+
+def _hashed_name(path):
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return f"{stem}.{digest}{ext}"
+
+
+def _remove_stale_copies(name, current):
+    stem, ext = os.path.splitext(name)
+    for entry in os.listdir(STATIC_DIR):
+        if entry != current and entry.startswith(stem + ".") and entry.endswith(ext):
+            try:
+                os.remove(os.path.join(STATIC_DIR, entry))
+            except OSError:
+                pass
+
+
+def publish_assets():
+    """
+    Copies each asset into ./static as name.<content hash>.ext, so a changed
+    file always gets a new URL and old URLs can be cached indefinitely.
+    """
+    with _lock:
+        if _published:
+            return dict(_published)
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        for name in PUBLISHED_ASSETS:
+            src = os.path.join(ASSETS_DIR, name)
+            if not os.path.exists(src):
+                continue
+            hashed = _hashed_name(src)
+            dest = os.path.join(STATIC_DIR, hashed)
+            if not os.path.exists(dest):
+                shutil.copyfile(src, dest)
+                _remove_stale_copies(name, hashed)
+            _published[name] = hashed
+        return dict(_published)
+
+
+def asset_image(name):
+    """
+    Returns what st.image should load for an asset: its hashed static URL when
+    static serving is on, otherwise the file path. Raises if the asset is missing.
+    """
+    path = os.path.join(ASSETS_DIR, name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return _static_url(name) or path
+
+
+def _static_url(name):
+    """The asset's hashed static URL, or None if static serving is off."""
+    if static_serving_enabled():
+        hashed = publish_assets().get(name)
+        if hashed:
+            return STATIC_URL + hashed
+    return None
+
+
+def _img_src(name):
+    url = _static_url(name)
+    if url:
+        return url
+    # Fallback: inline data URI (computed once, like the rest of the header)
+    with open(os.path.join(ASSETS_DIR, name), "rb") as f:
+        return "data:image/png;base64," + base64.b64encode(f.read()).decode()
+
+
+def stylesheet_html():
+    """
+    The app's CSS, built once per process: a one-line import of the hashed
+    stylesheet, which the browser caches, or the whole sheet inline if static
+    serving is off.
+    """
+    global _stylesheet_html
+    if _stylesheet_html is None:
+        url = _static_url("style.css")
+        if url:
+            _stylesheet_html = f'<style>@import url("{url}");</style>'
+        else:
+            with open(os.path.join(ASSETS_DIR, "style.css"), encoding="utf-8") as f:
+                _stylesheet_html = f"<style>\n{f.read()}</style>"
+    return _stylesheet_html
+
+
+def header_html():
+    """The red header bar markup, built once per process."""
+    global _header_html
+    if _header_html is not None:
+        return _header_html
+
+    logo_html = '<div class="logo-text">Sleigh or Nay?</div>'
+    elf_html = ""
+    try:
+        if os.path.exists(os.path.join(ASSETS_DIR, "logo.png")):
+            logo_html = f'<img src="{_img_src("logo.png")}" class="header-logo-img" alt="Sleigh or Nay?">'
+        if os.path.exists(os.path.join(ASSETS_DIR, "elf_gpt.png")):
+            elf_html = f'<img src="{_img_src("elf_gpt.png")}" class="header-elf-img" alt="Elf GPT">'
+    except Exception:
+        logo_html = '<div class="logo-text">Sleigh or Nay?</div>'
+
+    _header_html = f"""
+<div class="header-container">
+    <div class="header-logo-wrapper">
+        {logo_html}
+        {elf_html}
+    </div>
+</div>
+"""
+    return _header_html
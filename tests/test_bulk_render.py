@@ -0,0 +1,30 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bulk_render
+
+
+def _slow_render(**kwargs):
+    # Like pdf_generator's renderers: any Exception is logged and swallowed
+    try:
+        time.sleep(5)
+    except Exception:
+        return None
+
+
+def test_slow_render_is_reported_as_timed_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_render.pdf_generator, "create_certificate_pdf", _slow_render)
+    paths = {"certificate": str(tmp_path / "cert.pdf")}
+    record = {"id": "slow", "score": 7}
+
+    start = time.perf_counter()
+    record_id, timings, error = bulk_render.render_record(record, paths, str(tmp_path), "today", 0.2)
+
+    assert record_id == "slow"
+    assert error == "timed out after 0.2s"
+    assert "certificate" not in timings
+    assert not os.path.exists(paths["certificate"])
+    assert time.perf_counter() - start < 2
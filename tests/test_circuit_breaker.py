@@ -0,0 +1,115 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def breaker(clock):
+    return circuit_breaker.CircuitBreaker(window=4, min_calls=4, failure_rate=0.5,
+                                          slow_call_seconds=10, open_seconds=30)
+
+
+def _trip(breaker):
+    for _ in range(4):
+        breaker.record_failure(breaker.allow())
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_below_min_calls(breaker):
+    for _ in range(3):
+        breaker.record_failure(breaker.allow())
+    assert breaker.state == CLOSED
+
+
+def test_trips_at_the_failure_rate(breaker):
+    breaker.record_success(breaker.allow(), 1)
+    breaker.record_success(breaker.allow(), 1)
+    breaker.record_failure(breaker.allow())
+    assert breaker.state == CLOSED
+    breaker.record_failure(breaker.allow())
+    assert breaker.state == OPEN  # 2 of 4 bad
+
+
+def test_stays_closed_under_the_failure_rate(breaker):
+    for _ in range(3):
+        breaker.record_success(breaker.allow(), 1)
+    breaker.record_failure(breaker.allow())
+    assert breaker.state == CLOSED
+
+
+def test_slow_successes_count_as_bad(breaker):
+    for _ in range(4):
+        breaker.record_success(breaker.allow(), 15)
+    assert breaker.state == OPEN
+
+
+def test_open_refuses_until_the_probe_is_due(breaker, clock):
+    _trip(breaker)
+    assert breaker.allow() is None
+    clock[0] += 29
+    assert breaker.allow() is None
+    clock[0] += 1
+    probe = breaker.allow()
+    assert probe is not None and breaker.state == HALF_OPEN
+    assert breaker.allow() is None  # one probe at a time
+
+
+def test_probe_success_closes(breaker, clock):
+    _trip(breaker)
+    clock[0] += 30
+    breaker.record_success(breaker.allow(), 1)
+    assert breaker.state == CLOSED
+    assert breaker.allow() is not None
+
+
+@pytest.mark.parametrize("outcome", ["failure", "slow"])
+def test_bad_probe_reopens(breaker, clock, outcome):
+    _trip(breaker)
+    clock[0] += 30
+    probe = breaker.allow()
+    if outcome == "failure":
+        breaker.record_failure(probe)
+    else:
+        breaker.record_success(probe, 15)
+    assert breaker.state == OPEN
+    assert breaker.allow() is None
+    clock[0] += 30
+    assert breaker.allow() is not None
+
+
+def test_released_probe_lets_the_next_call_probe(breaker, clock):
+    _trip(breaker)
+    clock[0] += 30
+    breaker.release(breaker.allow())
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is not None
+
+
+def test_calls_from_before_the_trip_cannot_free_or_decide_the_probe(breaker, clock):
+    early = breaker.allow()
+    _trip(breaker)
+    clock[0] += 30
+    probe = breaker.allow()
+
+    breaker.release(early)
+    assert breaker.allow() is None
+    breaker.record_success(early, 1)
+    assert breaker.state == HALF_OPEN
+    breaker.record_failure(early)
+    assert breaker.state == HALF_OPEN
+
+    breaker.record_success(probe, 1)
+    assert breaker.state == CLOSED
@@ -0,0 +1,65 @@
+import hashlib
+import hmac
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import payments
+
+SECRET = "whsec_test"
+PAYLOAD = b'{"type": "checkout.session.completed"}'
+NOW = 1_700_000_000
+
+
+def _sign(payload=PAYLOAD, timestamp=NOW, secret=SECRET):
+    signed = str(timestamp).encode("ascii") + b"." + payload
+    return hmac.new(secret.encode("utf-8"), signed, hashlib.sha256).hexdigest()
+
+
+def test_valid_signature_passes():
+    payments.verify_signature(PAYLOAD, f"t={NOW},v1={_sign()}", SECRET, now=NOW)
+
+
+def test_any_matching_v1_signature_passes():
+    # Stripe sends one v1 per active secret while a secret is being rolled
+    header = f"t={NOW},v1={_sign(secret='whsec_old')},v0=ignored,v1={_sign()}"
+    payments.verify_signature(PAYLOAD, header, SECRET, now=NOW)
+
+
+@pytest.mark.parametrize("header", [
+    f"t={NOW},v1={_sign(secret='whsec_other')}",  # wrong secret
+    f"t={NOW},v1={_sign(payload=b'{}')}",          # body changed
+    f"t={NOW + 1},v1={_sign()}",                   # timestamp changed
+])
+def test_mismatched_signature_is_rejected(header):
+    with pytest.raises(payments.SignatureError, match="does not match"):
+        payments.verify_signature(PAYLOAD, header, SECRET, now=NOW)
+
+
+@pytest.mark.parametrize("header", [None, "", "v1=abc", f"t={NOW}", f"t=soon,v1={_sign()}", "garbage"])
+def test_malformed_header_is_rejected(header):
+    with pytest.raises(payments.SignatureError, match="Malformed"):
+        payments.verify_signature(PAYLOAD, header, SECRET, now=NOW)
+
+
+def test_missing_secret_is_rejected():
+    with pytest.raises(payments.SignatureError, match="secret"):
+        payments.verify_signature(PAYLOAD, f"t={NOW},v1={_sign()}", "", now=NOW)
+
+
+@pytest.mark.parametrize("skew", [-300, 300])
+def test_timestamp_at_the_tolerance_edge_passes(skew):
+    payments.verify_signature(PAYLOAD, f"t={NOW},v1={_sign()}", SECRET, tolerance=300, now=NOW + skew)
+
+
+@pytest.mark.parametrize("skew", [-301, 301])
+def test_timestamp_outside_the_tolerance_is_rejected(skew):
+    with pytest.raises(payments.SignatureError, match="tolerance"):
+        payments.verify_signature(PAYLOAD, f"t={NOW},v1={_sign()}", SECRET, tolerance=300, now=NOW + skew)
+
+
+def test_zero_tolerance_skips_the_age_check():
+    payments.verify_signature(PAYLOAD, f"t={NOW},v1={_sign()}", SECRET, tolerance=0, now=NOW + 86400)
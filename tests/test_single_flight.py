@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import single_flight
+
+
+def _follow(flight, key, fn, out, joined):
+    fields = []
+
+    def on_field(k, v):
+        fields.append((k, v))
+        joined.set()
+
+    out["result"] = flight.do(key, fn, on_field=on_field)
+    out["fields"] = fields
+
+
+def test_follower_replays_fields_and_shares_the_result():
+    flight = single_flight.SingleFlight("test")
+    joined = threading.Event()
+    follower_calls = []
+    out = {}
+
+    def lead(publish):
+        publish("verdict_title", "T")
+        follower = threading.Thread(target=_follow, args=(flight, "k", follower_calls.append, out, joined))
+        follower.start()
+        assert joined.wait(5)
+        publish("score", 8)
+        lead.follower = follower
+        return {"score": 8}
+
+    leader_fields = []
+    result = flight.do("k", lead, on_field=lambda k, v: leader_fields.append((k, v)))
+    lead.follower.join(5)
+
+    assert result == ({"score": 8}, False)
+    assert out["result"] == ({"score": 8}, True)
+    assert out["fields"] == leader_fields == [("verdict_title", "T"), ("score", 8)]
+    assert follower_calls == []
+
+
+def test_follower_takes_over_when_the_leader_is_abandoned():
+    flight = single_flight.SingleFlight("test")
+    cancel = threading.Event()
+    joined = threading.Event()
+    out = {}
+
+    def lead(publish):
+        publish("verdict_title", "T")
+        follower = threading.Thread(target=_follow, args=(flight, "k", lambda publish: "own", out, joined))
+        follower.start()
+        assert joined.wait(5)
+        lead.follower = follower
+        cancel.set()
+        return None
+
+    assert flight.do("k", lead, cancel=cancel) == (None, False)
+    lead.follower.join(5)
+
+    assert out["result"] == ("own", False)
+    assert flight._calls == {}
+
+
+def test_errors_reach_every_caller():
+    flight = single_flight.SingleFlight("test")
+    joined = threading.Event()
+    out = {}
+
+    def lead(publish):
+        publish("score", 1)
+        follower = threading.Thread(target=_follow_raising, args=(flight, out, joined))
+        follower.start()
+        assert joined.wait(5)
+        lead.follower = follower
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        flight.do("k", lead)
+    lead.follower.join(5)
+    assert isinstance(out["error"], ConnectionError)
+
+
+def _follow_raising(flight, out, joined):
+    try:
+        flight.do("k", lambda publish: "unused", on_field=lambda k, v: joined.set())
+    except ConnectionError as e:
+        out["error"] = e
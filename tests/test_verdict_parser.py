@@ -0,0 +1,85 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import verdict_parser
+
+VERDICT = {
+    "verdict_title": "It's a Total SLEIGH!",
+    "score": 9,
+    "roast_content": 'The tree said "slay", no cap.',
+    "santa_comment": "You're doing amazing, sweetie.",
+}
+
+
+def _feed_in_chunks(text, size, field_names=None):
+    parser = verdict_parser.IncrementalVerdictParser(field_names)
+    fields = []
+    for i in range(0, len(text), size):
+        fields.extend(parser.feed(text[i:i + size]))
+    return fields
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_fields_survive_keys_and_strings_split_across_chunks(size):
+    text = json.dumps(VERDICT)
+    assert _feed_in_chunks(text, size) == list(VERDICT.items())
+
+
+def test_escaped_quotes_and_delimiters_inside_strings():
+    text = '{"roast_content": "a \\"quoted\\" {brace}, [bracket] and \\\\", "score": 4}'
+    fields = dict(_feed_in_chunks(text, 5))
+    assert fields == {"roast_content": 'a "quoted" {brace}, [bracket] and \\', "score": 4}
+
+
+def test_fields_are_reported_once_under_their_mapped_names():
+    text = '{"a_verdict_title": "T", "b_score": 8, "b_score": 9}'
+    fields = _feed_in_chunks(text, 4, {"a_verdict_title": "verdict_title", "b_score": "score"})
+    assert fields == [("verdict_title", "T"), ("score", 8)]
+
+
+def test_clean_response():
+    verdict, outcome = verdict_parser.parse_verdict("```json\n" + json.dumps(VERDICT) + "\n```")
+    assert outcome == "ok"
+    assert verdict == VERDICT
+
+
+def test_truncated_response_keeps_completed_fields_only():
+    text = '{"verdict_title": "Mid", "score": 5, "roast_content": "done", "santa_comment": "half a sent'
+    verdict, outcome = verdict_parser.parse_verdict(text)
+    assert outcome == "recovered"
+    assert verdict == {"verdict_title": "Mid", "score": 5, "roast_content": "done"}
+
+
+def test_truncated_required_string_fails():
+    verdict, outcome = verdict_parser.parse_verdict('{"score": 7, "roast_content": "half a sent')
+    assert (verdict, outcome) == (None, "failed")
+
+
+def test_truncated_trailing_number_is_dropped():
+    verdict, outcome = verdict_parser.parse_verdict('{"roast_content": "done", "score": 1')
+    assert (verdict, outcome) == (None, "failed")
+
+
+def test_object_inside_prose_is_recovered():
+    verdict, outcome = verdict_parser.parse_verdict("Sure! " + json.dumps(VERDICT) + " Hope that helps.")
+    assert outcome == "recovered"
+    assert verdict == VERDICT
+
+
+@pytest.mark.parametrize("raw, score", [
+    (8, 8), (8.6, 9), ("8", 8), ("8/10", 8), (0, 1), (-3, 1), (11, 10), (1e300, 10),
+])
+def test_score_is_coerced_and_clamped(raw, score):
+    verdict, _ = verdict_parser.parse_verdict(json.dumps({"score": raw, "roast_content": "r"}))
+    assert verdict["score"] == score
+
+
+@pytest.mark.parametrize("raw", ['1e400', '-1e400', 'NaN', '"ten"', 'true', 'null'])
+def test_unusable_score_fails(raw):
+    verdict, outcome = verdict_parser.parse_verdict('{"score": ' + raw + ', "roast_content": "r"}')
+    assert (verdict, outcome) == (None, "failed")
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# --- Configuration ---
+# VERDICT_CACHE_BACKEND is "memory" (default), "sqlite" or "off"
+BACKEND = os.environ.get("VERDICT_CACHE_BACKEND", "memory").lower()
+SQLITE_PATH = os.environ.get("VERDICT_CACHE_PATH", "verdict_cache.db")
+TTL_SECONDS = float(os.environ.get("VERDICT_CACHE_TTL", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.environ.get("VERDICT_CACHE_MAX_ENTRIES", "5000"))
+
+
+def verdict_key(image_parts, prompt, model_name):
+    """
+    Content hash of the preprocessed image blobs plus the prompt and model.
+    Preprocessing is deterministic, so the same photo always maps to the same key,
+    and any prompt or model change starts a fresh keyspace.
+    """
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0")
+    h.update(hashlib.sha256(prompt.encode("utf-8")).digest())
+    for part in image_parts:
+        h.update(b"\0")
+        h.update(part["mime_type"].encode("utf-8"))
+        h.update(hashlib.sha256(part["data"]).digest())
+    return h.hexdigest()
+
+
+class MemoryBackend:
+    """In-process LRU with a TTL on every entry."""
+
+    def __init__(self, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (stored_at, verdict)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(entry[1])
+
+    def put(self, key, verdict):
+        with self._lock:
+            self._entries[key] = (time.time(), dict(verdict))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteBackend:
+    """
+    Local-disk cache shared by every worker process on the host.
+    Entries expire after the TTL; beyond max_entries the least recently read go first.
+    """
+
+    def __init__(self, path=SQLITE_PATH, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                "key TEXT PRIMARY KEY, verdict TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS verdicts_accessed ON verdicts (accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        """One connection per use: committed (or rolled back) and closed on exit."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Returns the cached verdict, or None. A database error counts as a miss."""
+        try:
+            return self._get(key)
+        except sqlite3.Error as e:
+            print(f"Verdict cache read failed, treating as a miss: {e}")
+            return None
+
+    def put(self, key, verdict):
+        """Stores the verdict. A database error skips the write rather than losing the verdict."""
+        try:
+            self._put(key, verdict)
+        except sqlite3.Error as e:
+            print(f"Verdict cache write failed, not cached: {e}")
+
+    def _get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT verdict FROM verdicts WHERE key = ? AND stored_at > ?",
+                (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE verdicts SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def _put(self, key, verdict):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, verdict, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(verdict), now, now)
+            )
+            conn.execute("DELETE FROM verdicts WHERE stored_at <= ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM verdicts WHERE key IN ("
+                "SELECT key FROM verdicts ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+
+class NullBackend:
+    """Caching disabled."""
+
+    def get(self, key):
+        return None
+
+    def put(self, key, verdict):
+        pass
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "sqlite": SQLiteBackend,
+    "off": NullBackend,
+}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_verdict_cache():
+    """Returns the process-wide verdict cache for the configured backend."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = BACKENDS.get(BACKEND, MemoryBackend)()
+            except sqlite3.Error as e:
+                print(f"Verdict cache backend '{BACKEND}' unavailable, using memory: {e}")
+                _cache = MemoryBackend()
+        return _cache
@@ -0,0 +1,166 @@
+import json
+import math
+import re
+
+import metrics
+
+
+class IncrementalVerdictParser:
+    """
+    Consumes a streamed JSON object chunk by chunk and reports each top-level
+    field as soon as its value is complete, e.g. "verdict_title" long before
+    "roast_content" has finished generating. Markdown fences are ignored.
+    Keys found in field_names are reported under the name they map to.
+    """
+
+    def __init__(self, field_names=None):
+        self.field_names = field_names or {}
+        self.buffer = ""
+        self.fields = {}
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._field_start = None
+
+    def feed(self, chunk):
+        """Adds text and returns a list of (key, value) pairs completed by it."""
+        self.buffer += chunk
+        completed = []
+        buf = self.buffer
+
+        while self._pos < len(buf):
+            ch = buf[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = self._depth > 0
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._field_start = self._pos + 1
+            elif ch in "}]":
+                if self._depth == 1:
+                    completed.extend(self._close_field(self._pos))
+                self._depth = max(0, self._depth - 1)
+            elif ch == "," and self._depth == 1:
+                completed.extend(self._close_field(self._pos))
+                self._field_start = self._pos + 1
+            self._pos += 1
+
+        return completed
+
+    def _close_field(self, end):
+        if self._field_start is None:
+            return []
+        segment = self.buffer[self._field_start:end].strip()
+        if not segment:
+            return []
+        try:
+            parsed = json.loads("{" + segment + "}")
+        except ValueError:
+            return []
+        items = [(self.field_names.get(k, k), v) for k, v in parsed.items()]
+        items = [(k, v) for k, v in items if k not in self.fields]
+        self.fields.update(items)
+        return items
+
+    def finish(self):
+        """
+        Ends a response that was cut off and returns every field that completed.
+        The last field counts only if its string value was closed; a value cut
+        off mid-way (string, number, nested object) is dropped, not patched up.
+        """
+        if not self._in_string and self._depth == 1 and self.buffer.rstrip().endswith('"'):
+            self.feed("}")
+        return self.fields
+
+
+# --- Validating Parser ---
+REQUIRED_FIELDS = ("score", "roast_content")
+TEXT_FIELDS = ("verdict_title", "roast_content", "santa_comment")
+
+OUTCOMES = ("ok", "recovered", "failed")
+
+metrics.describe("sleigh_verdict_parse_total", "Model responses parsed, by outcome (ok, recovered, failed).")
+
+
+def _record(outcome):
+    metrics.inc("sleigh_verdict_parse_total", {"outcome": outcome})
+    if outcome != "ok":
+        counts = {o: metrics.counter("sleigh_verdict_parse_total", {"outcome": o}) for o in OUTCOMES}
+        total = sum(counts.values())
+        print(f"Verdict parse {outcome} (failure rate {counts['failed']}/{total} = {counts['failed'] / total:.1%})")
+
+
+def _coerce_score(value):
+    """Turns 8, 8.6, "8" or "8/10" into an int clamped to 1-10. Infinity and NaN are rejected."""
+    if isinstance(value, str):
+        match = re.search(r"-?\d+(\.\d+)?", value)
+        if not match:
+            return None
+        value = float(match.group())
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    if not math.isfinite(value):
+        return None
+    return max(1, min(10, int(round(value))))
+
+
+def _candidates(text, field_names):
+    """Yields (dict, exact) guesses at the verdict object, most trustworthy first."""
+    cleaned = text.replace("```json", "").replace("```", "").strip()
+    try:
+        yield json.loads(cleaned), True
+    except ValueError:
+        pass
+
+    # Object followed (or preceded) by stray prose
+    start = cleaned.find("{")
+    if start != -1:
+        try:
+            obj, _ = json.JSONDecoder().raw_decode(cleaned[start:])
+            yield obj, False
+        except ValueError:
+            pass
+
+    # Truncated object: keep every field that did complete
+    parser = IncrementalVerdictParser(field_names)
+    parser.feed(cleaned)
+    yield parser.finish(), False
+
+
+def parse_verdict(text, field_names=None):
+    """
+    Parses a model response into a verdict dict, tolerating code fences, trailing
+    text and truncation. Returns (verdict, outcome): outcome is "ok" for a clean
+    response, "recovered" if fields had to be repaired or were missing, and
+    "failed" (with verdict None) if no score and roast can be recovered.
+    Keys found in field_names are renamed to the name they map to.
+    """
+    with metrics.timed("parse"):
+        return _parse_verdict(text, field_names or {})
+
+
+def _parse_verdict(text, field_names):
+    for obj, exact in _candidates(text or "", field_names):
+        if not isinstance(obj, dict):
+            continue
+        obj = {field_names.get(k, k): v for k, v in obj.items()}
+        verdict = {k: str(obj[k]) for k in TEXT_FIELDS if obj.get(k) is not None}
+        score = _coerce_score(obj.get("score"))
+        if score is not None:
+            verdict["score"] = score
+        if all(k in verdict for k in REQUIRED_FIELDS):
+            clean = exact and score == obj.get("score") and len(verdict) == len(TEXT_FIELDS) + 1
+            outcome = "ok" if clean else "recovered"
+            _record(outcome)
+            return verdict, outcome
+
+    _record("failed")
+    return None, "failed"
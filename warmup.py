@@ -0,0 +1,211 @@
+"""
+Process-start warm-up: everything the first visitor would otherwise wait for.
+
+    python serve.py --server.port=8501   # warm up, then start Streamlit (see serve.py)
+    python warmup.py                     # run the warm-up once and report, exit 1 on failure
+    python warmup.py --check             # health check: exit 0 if the server reports ready
+
+Validates every file under assets/ (images decode, PDF templates parse into
+pdf_generator's template cache), renders one throwaway certificate and case
+file per template (loading ReportLab's fonts and pypdf), publishes the static
+images and primes the Gemini connection. The process counts as ready once
+the assets and renders succeeded; a model that can't be reached is reported
+but doesn't hold readiness back, since the circuit breaker covers it.
+
+Readiness is served at /ready on the metrics endpoint (SLEIGH_METRICS_PORT):
+200 once ready, 503 before, with the step timings as JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import metrics
+
+# --- Configuration ---
+# 0 skips the background warm-up of a plain `streamlit run` (cold_start.py
+# measures page views without it); serve.py's warm-up always runs
+BACKGROUND = os.environ.get("SLEIGH_WARMUP_BACKGROUND", "1") == "1"
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(ROOT_DIR, "assets")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# Shared with the /ready route; written by the warm-up thread only
+state = {"ready": False, "started_at": None, "finished_at": None, "steps": {}, "errors": [], "model": None}
+metrics.describe("sleigh_ready", "1 once the process has warmed up and is ready for traffic.")
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def _sample_photo():
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (1200, 900), (200, 30, 40))
+    ImageDraw.Draw(img).ellipse((300, 150, 900, 750), fill=(250, 250, 250))
+    return img
+
+
+def validate_assets():
+    """Decodes every image and parses every PDF template under assets/. Returns the problems found."""
+    from PIL import Image
+    import pdf_generator
+
+    errors = []
+    for entry in sorted(os.listdir(ASSETS_DIR)):
+        path = os.path.join(ASSETS_DIR, entry)
+        try:
+            if entry.lower().endswith(IMAGE_EXTENSIONS):
+                with Image.open(path) as img:
+                    img.load()
+            elif entry.lower().endswith(".pdf"):
+                # Leaves the parsed template in pdf_generator's cache
+                pdf_generator.get_template_writer(path)
+        except Exception as e:
+            errors.append(f"{entry}: {e}")
+    return errors
+
+
+def render_samples():
+    """Renders a throwaway certificate or case file from each template. Returns the problems found."""
+    import pdf_generator
+
+    errors = []
+    photo = _sample_photo()
+    for entry in sorted(os.listdir(ASSETS_DIR)):
+        path = os.path.join(ASSETS_DIR, entry)
+        if entry.startswith("certificate_") and entry.endswith(".pdf"):
+            stream = pdf_generator.create_certificate_pdf(
+                name="Warm-up Elf", verdict="Sleigh", score=8, comment="Ho ho ho!", template_path=path
+            )
+        elif entry.startswith("elf_report_") and entry.endswith(".pdf"):
+            stream = pdf_generator.create_roast_report(
+                name="Warm-up Elf", verdict="Sleigh", score=8,
+                roast_content="The elves are stretching before their shift.",
+                santa_comment="Ho ho ho!", pil_images=[photo], template_path=path
+            )
+        else:
+            continue
+        if stream is None or not stream.getvalue().startswith(b"%PDF"):
+            errors.append(f"{entry}: sample render failed")
+    return errors
+
+
+def publish_static():
+    """Copies the UI images into ./static under their content-hashed names."""
+    import static_assets
+
+    static_assets.publish_assets()
+    return []
+
+
+def prime_model(api_key):
+    """Creates the model client and opens its connection (bounded by elf_gpt.WARM_UP_TIMEOUT)."""
+    import elf_gpt
+
+    if not api_key:
+        state["model"] = "skipped: no API key"
+        return
+    ok = elf_gpt.warm_up(api_key)
+    state["model"] = "ready" if ok else f"unreachable: {elf_gpt.health['error']}"
+
+
+def _step(name, fn, *args):
+    start = time.perf_counter()
+    try:
+        with metrics.timed(f"warmup_{name}"):
+            errors = fn(*args) or []
+    except Exception as e:
+        errors = [f"{name}: {e}"]
+    state["steps"][name] = round((time.perf_counter() - start) * 1000, 1)
+    state["errors"].extend(errors)
+
+
+def run(api_key):
+    """Runs every warm-up step once in this thread and returns whether the process is ready."""
+    state["started_at"] = time.time()
+    _step("assets", validate_assets)
+    _step("render", render_samples)
+    _step("static", publish_static)
+    _step("model", prime_model, api_key)
+    state["finished_at"] = time.time()
+    state["ready"] = not state["errors"]
+    for error in state["errors"]:
+        print(f"Warm-up problem: {error}")
+    print(f"Warm-up finished in {state['finished_at'] - state['started_at']:.1f}s "
+          f"({'ready' if state['ready'] else 'NOT ready'}, model {state['model']}): {state['steps']}")
+    return state["ready"]
+
+
+def start(api_key, background=False):
+    """
+    Runs the warm-up once per process: in this thread (serve.py, before
+    Streamlit listens) or in the background (plain `streamlit run`).
+    """
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    metrics.routes["/ready"] = readiness
+    metrics.gauge("sleigh_ready", lambda: 1 if state["ready"] else 0)
+    if background and not BACKGROUND:
+        print("Background warm-up disabled (SLEIGH_WARMUP_BACKGROUND=0)")
+    elif background:
+        threading.Thread(target=run, args=(api_key,), daemon=True, name="warm-up").start()
+    else:
+        run(api_key)
+
+
+def readiness():
+    """The /ready route: 200 once warmed up, 503 before."""
+    snapshot = dict(state, steps=dict(state["steps"]), errors=list(state["errors"]))
+    return (200 if snapshot["ready"] else 503), "application/json", json.dumps(snapshot) + "\n"
+
+
+def api_key_from_config():
+    """
+    GEMINI_API_KEY from the environment, else from Streamlit secrets. The
+    environment comes first so serve.py doesn't parse Streamlit's config
+    before the command-line flags are applied.
+    """
+    api_key = os.environ.get("GEMINI_API_KEY", "")
+    if api_key:
+        return api_key
+    try:
+        import streamlit as st
+        return st.secrets["GEMINI_API_KEY"]
+    except Exception:
+        return ""
+
+
+def check(port):
+    """Exit status for a container health check: 0 if /ready answers 200."""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=5) as response:
+            return 0 if response.status == 200 else 1
+    except (urllib.error.URLError, OSError):
+        return 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm up (or health-check) the app process.")
+    parser.add_argument("--check", action="store_true", help="Exit 0 if the running server reports ready")
+    parser.add_argument("--port", type=int, default=metrics.METRICS_PORT, help="Metrics port serving /ready")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        if not args.port:
+            print("No metrics port: set SLEIGH_METRICS_PORT or pass --port")
+            return 1
+        return check(args.port)
+    return 0 if run(api_key_from_config()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())